@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """Кэши процесса не откатываются вместе с тестовой БД (core.testing)."""
+    from core.testing import reset
+    reset()
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite)
+        from . import identity
+        identity.track(get_user_model())
+        if settings.TEMPLATE_WARMUP:
+            from .warmup import warm_templates
+            warm_templates()
@@ -0,0 +1,52 @@
+"""Пользователь сессии из кэша core.identity.
+
+CachedAuthenticationMiddleware (core.middleware) загружает пользователя
+сессии так же, как django.contrib.auth.get_user, но через identity,
+если сессия создана ModelBackend. Бэкенд, записанный в сессию,
+не меняется, поэтому существующие сессии остаются действительными.
+
+Запись identity сверяется с версией пользователя в общем кэше, поэтому
+смена пароля или блокировка пользователя в любом процессе действует
+во всех процессах со следующего запроса, а не через
+IDENTITY_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+
+from . import identity
+
+
+def _session_user(request, backend):
+    User = auth.get_user_model()
+    try:
+        user = identity.get(
+            User, pk=User._meta.pk.to_python(request.session[auth.SESSION_KEY])
+        )
+    except User.DoesNotExist:
+        return None
+    if not backend.user_can_authenticate(user):
+        return None
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        request.session.flush()
+        return None
+    return user
+
+
+def get_user(request):
+    """django.contrib.auth.get_user с пользователем из load()."""
+    backend_path = request.session.get(auth.BACKEND_SESSION_KEY)
+    if (
+        auth.SESSION_KEY not in request.session
+        or backend_path not in settings.AUTHENTICATION_BACKENDS
+    ):
+        return AnonymousUser()
+    backend = auth.load_backend(backend_path)
+    if not isinstance(backend, ModelBackend):
+        return auth.get_user(request)
+    return _session_user(request, backend) or AnonymousUser()
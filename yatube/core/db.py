@@ -0,0 +1,29 @@
+"""Настройка подключений к БД и статистика планировщика."""
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS для нового подключения к SQLite.
+
+    Обработчик сигнала connection_created: PRAGMA действуют только
+    в пределах подключения, кроме journal_mode=wal, который
+    сохраняется в файле БД.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def analyze(using='default'):
+    """Обновляет статистику таблиц (ANALYZE) после массовой загрузки.
+
+    По ней планировщик выбирает индексы, а пагинаторы лент оценивают
+    число строк без COUNT(*) (см. core.paginators.table_rows).
+    """
+    connection = connections[using]
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,192 @@
+"""Кэш пользователей и групп в памяти процесса.
+
+Горячие страницы ищут одни и те же строки: автора профиля по username,
+группу по slug, пользователя сессии по pk. identity.get отдает их
+из LRU-кэша процесса без запроса к БД. Запись живет
+IDENTITY_CACHE_TIMEOUT секунд.
+
+Сигналы post_save и post_delete видит только свой процесс, поэтому
+они сдвигают версию строки в кэше Django, который в профиле prod общий
+для всех процессов. Запись кэша процесса выдается, только если версия
+строки не сдвинулась с момента чтения из БД: изменение, сделанное
+в другом процессе, видно со следующего запроса, и страницы, собранные
+после сдвига версии их области (см. posts.cache), не получат старую
+группу или автора. Проверка версии — одно чтение общего кэша вместо
+запроса к БД. Изменения через QuerySet.update сигналов не посылают
+и видны лишь по истечении срока, если версию не сдвинуть явно (bump).
+
+Кэш хранит значения полей, а каждый вызов строит новый экземпляр:
+запросы не делят между собой объект и загруженные в него связи.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+from .metrics import record_cache
+
+MISSING = object()
+
+
+class LRUCache:
+    """Словарь с вытеснением давно не читавшихся записей и сроком жизни."""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key, timeout):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            stored, value = entry
+            if self.clock() - stored >= timeout:
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, maxsize):
+        with self.lock:
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# (модель, pk) -> (версия, значения полей); (модель, поле, значение) -> pk.
+objects = LRUCache()
+keys = LRUCache()
+_tracked = set()
+
+
+def enabled():
+    return settings.IDENTITY_CACHE_TIMEOUT > 0
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _version_key(model, pk):
+    return f'identity:{_label(model)}:{pk}'
+
+
+def _cached(model, field, value):
+    timeout = settings.IDENTITY_CACHE_TIMEOUT
+    pk = value if field == 'pk' else keys.get(
+        (_label(model), field, value), timeout
+    )
+    if pk is MISSING:
+        return None
+    entry = objects.get((_label(model), pk), timeout)
+    if entry is MISSING:
+        return None
+    version, values = entry
+    if cache.get(_version_key(model, pk)) != version:
+        return None
+    instance = model.from_db(DEFAULT_DB_ALIAS, _fields(model), values)
+    # Значение могло смениться после записи: старое имя ведет на pk,
+    # у которого уже другое имя.
+    if field != 'pk' and getattr(instance, field) != value:
+        return None
+    return instance
+
+
+def _store(instance, field, started):
+    """Запоминает строку, прочитанную из БД после момента started.
+
+    Если версия сдвинута позже started, строка могла быть прочитана
+    до изменения, и запоминать ее нельзя.
+    """
+    model = type(instance)
+    version = cache.get(_version_key(model, instance.pk))
+    if version is not None and version >= started:
+        return
+    maxsize = settings.IDENTITY_CACHE_SIZE
+    objects.set(
+        (_label(model), instance.pk),
+        (version, tuple(getattr(instance, name) for name in _fields(model))),
+        maxsize
+    )
+    if field != 'pk':
+        keys.set(
+            (_label(model), field, getattr(instance, field)), instance.pk,
+            maxsize
+        )
+
+
+def get(model, **lookup):
+    """Экземпляр модели по pk или уникальному полю: get(User, username=...).
+
+    Отсутствующая строка не кэшируется: model.DoesNotExist.
+    """
+    (field, value), = lookup.items()
+    if not enabled():
+        return model._default_manager.get(**lookup)
+    track(model)
+    instance = _cached(model, field, value)
+    record_cache('identity', int(instance is not None), int(instance is None))
+    if instance is None:
+        started = time.time_ns()
+        instance = model._default_manager.get(**lookup)
+        _store(instance, field, started)
+    return instance
+
+
+def get_or_404(model, **lookup):
+    try:
+        return get(model, **lookup)
+    except model.DoesNotExist:
+        raise Http404(f'{model._meta.object_name} не найден')
+
+
+def bump(model, pk):
+    """Сдвигает версию строки: записи всех процессов устаревают."""
+    cache.set(_version_key(model, pk), time.time_ns(), None)
+
+
+def forget(sender, instance, **kwargs):
+    """Удаляет экземпляр из кэша; обработчик post_save и post_delete."""
+    objects.delete((_label(sender), instance.pk))
+    bump(sender, instance.pk)
+
+
+def track(model):
+    """Подключает сброс кэша к сигналам модели, один раз на модель.
+
+    Приложения вызывают track при запуске, чтобы версию сдвигали
+    и процессы, которые сами модель из кэша не читают.
+    """
+    if model in _tracked:
+        return
+    uid = f'identity:{_label(model)}'
+    post_save.connect(forget, sender=model, dispatch_uid=uid)
+    post_delete.connect(forget, sender=model, dispatch_uid=uid)
+    _tracked.add(model)
+
+
+def clear():
+    objects.clear()
+    keys.clear()
@@ -0,0 +1,225 @@
+"""Метрики запросов по представлениям.
+
+MetricsMiddleware собирает для каждого запроса число и время
+SQL-запросов, время рендеринга шаблонов и обращения к кэшам страниц
+и карточек, а затем добавляет их в гистограммы представления
+(posts:index, posts:profile, ...). Гистограммы живут в памяти процесса:
+каждый процесс WSGI-сервера отдает на /metrics/ свои значения,
+Prometheus различает их по меткам цели.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5
+)
+
+# Имя -> (описание, границы корзин, атрибут Sample).
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса', SECONDS_BUCKETS, 'duration'
+    ),
+    'yatube_request_queries': (
+        'Число SQL-запросов за запрос', QUERY_BUCKETS, 'queries'
+    ),
+    'yatube_request_db_seconds': (
+        'Время SQL-запросов за запрос', SECONDS_BUCKETS, 'db_time'
+    ),
+    'yatube_request_template_seconds': (
+        'Время рендеринга шаблонов за запрос', SECONDS_BUCKETS,
+        'template_time'
+    ),
+}
+CACHE_COUNTER = 'yatube_cache_requests_total'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем QUERY_BUDGETS."""
+
+
+class Sample:
+    """Измерения одного запроса."""
+    def __init__(self):
+        self.duration = 0
+        self.queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.template_depth = 0
+        self.cache = {}
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка курсора для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Гистограммы и счетчики обращений к кэшу по представлениям."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.cache = {}
+
+    def observe(self, view, sample):
+        with self.lock:
+            for name, (_, buckets, attribute) in HISTOGRAMS.items():
+                histogram = self.histograms.setdefault(
+                    (name, view), Histogram(buckets)
+                )
+                histogram.observe(getattr(sample, attribute))
+            for (cache, result), count in sample.cache.items():
+                key = (view, cache, result)
+                self.cache[key] = self.cache.get(key, 0) + count
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.cache.clear()
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus."""
+        lines = []
+        with self.lock:
+            for name, (help_text, _, _) in HISTOGRAMS.items():
+                lines += [
+                    f'# HELP {name} {help_text}',
+                    f'# TYPE {name} histogram',
+                ]
+                for (metric, view), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if metric == name:
+                        lines += _histogram_lines(name, view, histogram)
+            lines += [
+                f'# HELP {CACHE_COUNTER} Обращения к кэшу',
+                f'# TYPE {CACHE_COUNTER} counter',
+            ]
+            for (view, cache, result), count in sorted(self.cache.items()):
+                labels = _labels(view=view, cache=cache, result=result)
+                lines.append(f'{CACHE_COUNTER}{labels} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n'
+        )
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels.items()
+    ) + '}'
+
+
+def _histogram_lines(name, view, histogram):
+    lines = [
+        f'{name}_bucket{_labels(view=view, le=bound)} {count}'
+        for bound, count in zip(histogram.buckets, histogram.counts)
+    ]
+    return lines + [
+        f'{name}_bucket{_labels(view=view, le="+Inf")} {histogram.count}',
+        f'{name}_sum{_labels(view=view)} {histogram.sum:g}',
+        f'{name}_count{_labels(view=view)} {histogram.count}',
+    ]
+
+
+registry = Registry()
+
+
+def current():
+    """Измерения текущего запроса или None вне MetricsMiddleware."""
+    return getattr(_local, 'sample', None)
+
+
+@contextmanager
+def collect(sample):
+    """Направляет измерения потока в sample, пока открыт контекст."""
+    previous = current()
+    _local.sample = sample
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(sample.execute))
+            yield sample
+    finally:
+        sample.duration = time.perf_counter() - started
+        _local.sample = previous
+
+
+def record_cache(cache, hits, misses):
+    """Учитывает попадания и промахи кэша cache в текущем запросе."""
+    sample = current()
+    if sample is None:
+        return
+    for result, count in (('hit', hits), ('miss', misses)):
+        if count:
+            key = (cache, result)
+            sample.cache[key] = sample.cache.get(key, 0) + count
+
+
+def check_budget(view, sample):
+    """Проверяет лимит запросов представления, если он включен."""
+    if not settings.QUERY_BUDGETS_ENFORCED:
+        return
+    budget = settings.QUERY_BUDGETS.get(view)
+    if budget is not None and sample.queries > budget:
+        raise QueryBudgetExceeded(
+            f'{view}: {sample.queries} SQL-запросов при лимите {budget}'
+        )
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        sample = current()
+        if sample is None:
+            return super().render(context, request)
+        # Вложенный рендеринг уже входит во время внешнего.
+        sample.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django, учитывающий время рендеринга."""
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,40 @@
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from . import auth, metrics
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса и относит их к представлению.
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать и запросы к БД
+    из остальных middleware (сессии, пользователь).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with metrics.collect(metrics.Sample()) as sample:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe(view, sample)
+        metrics.check_budget(view, sample)
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, берущий пользователя сессии из кэша.
+
+    Пользователь загружается лениво, как и в AuthenticationMiddleware,
+    функцией core.auth.get_user.
+    """
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = auth.get_user(request)
+    return request._cached_user
@@ -0,0 +1,312 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections, router
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Курсор поврежден или не подходит к этой выборке."""
+
+
+def table_rows(model):
+    """Число строк таблицы модели по статистике СУБД или None.
+
+    SQLite хранит его в sqlite_stat1 после ANALYZE, PostgreSQL —
+    в pg_class.reltuples после ANALYZE или VACUUM. Значение
+    приблизительное, зато не требует чтения таблицы.
+    """
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            # Первое число stat — строки таблицы или индекса.
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+            )
+            rows = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(rows) if rows else None
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(table)]
+            )
+            row = cursor.fetchone()
+            # -1 или 0: таблицу еще не анализировали.
+            return int(row[0]) if row and row[0] > 0 else None
+    return None
+
+
+class WindowPaginatorMixin:
+    """Ссылки только на первые, последние и соседние с текущей страницы.
+
+    Шаблон перебирает page_obj.page_window вместо page_range, поэтому
+    число ссылок не зависит от числа страниц. Страница остается
+    обычным Page: окно записывается в ее атрибут.
+    """
+    ELLIPSIS = '…'
+    on_each_side = 3
+    on_ends = 1
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = (
+            list(self.get_elided_page_range(page.number))
+            if getattr(self, 'counted', True) else []
+        )
+        return page
+
+    def get_elided_page_range(self, number):
+        """Как Paginator.get_elided_page_range из Django 3.2."""
+        on_each_side, on_ends = self.on_each_side, self.on_ends
+        # Текущая страница может быть за оценкой числа страниц.
+        num_pages = max(self.num_pages, number)
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from range(1, num_pages + 1)
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+
+class WindowPaginator(WindowPaginatorMixin, Paginator):
+    """Обычный пагинатор с окном ссылок."""
+
+
+class CursorPaginator(WindowPaginatorMixin, Paginator):
+    """Пагинатор по ключу сортировки (keyset) вместо OFFSET.
+
+    Соседние страницы открываются по курсору: в нем закодированы ключ
+    крайней записи страницы и номер страницы, поэтому переход вперед
+    или назад — это диапазонный запрос по индексу без OFFSET.
+    Переход по номеру страницы (?page=N) по-прежнему доступен.
+
+    С count=False пагинатор не выполняет COUNT(*): общее число записей
+    известно лишь в пределах уже прочитанных строк, и шаблон показывает
+    только ссылки «вперед» и «назад». С estimate (оценка из статистики
+    СУБД или счетчика) COUNT(*) тоже не выполняется, а число страниц
+    считается по оценке; наличие следующей страницы и в этом случае
+    определяется по прочитанным строкам.
+    """
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, count=True, estimate=None,
+                 **kwargs):
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+        self.counted = count
+        self.estimate = estimate
+        self._count = None
+        self._known_count = 0
+
+    @property
+    def count(self):
+        """Число записей; без подсчета — сколько записей уже известно."""
+        if not self.counted:
+            return self._known_count
+        if self._count is None and self.estimate is not None:
+            return max(self.estimate, self._known_count)
+        if self._count is None:
+            self._count = self.object_list.count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        hits = max(1, self.count - self.orphans)
+        return -(-hits // self.per_page)
+
+    def validate_number(self, number):
+        if self.counted and self.estimate is None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def get_page(self, number=None, after=None, before=None):
+        """Возвращает страницу по курсору или номеру, как Paginator.get_page.
+
+        Неверный курсор или номер приводят на первую страницу, номер
+        за пределами выборки — на последнюю известную.
+        """
+        try:
+            if after:
+                return self.page_after(after)
+            if before:
+                return self.page_before(before)
+        except InvalidCursor:
+            number = 1
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            if self.estimate is not None:
+                # Оценка завышена: последняя страница — по точному числу.
+                self.estimate = None
+            if self.counted and self.num_pages > 1:
+                return self.page(self.num_pages)
+            return self.page(1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        rows = self.fetch(self.per_page + 1, offset=offset)
+        if not rows and number > 1:
+            raise EmptyPage('Страница не содержит записей')
+        self._remember(offset + len(rows))
+        return self._build_page(
+            rows[:self.per_page], number,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def page_after(self, cursor):
+        """Страница, следующая за записью из курсора."""
+        values, number = self.decode_cursor(cursor)
+        rows = self.fetch(self.per_page + 1, after=values)
+        if not rows:
+            raise InvalidCursor
+        self._remember((number - 1) * self.per_page + len(rows))
+        return self._build_page(
+            rows[:self.per_page], number,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
+
+    def page_before(self, cursor):
+        """Страница, предшествующая записи из курсора."""
+        values, number = self.decode_cursor(cursor)
+        rows = self.fetch(self.per_page + 1, before=values)
+        if len(rows) <= self.per_page:
+            # Дошли до начала выборки: отдаем полноценную первую страницу.
+            return self.page(1)
+        self._remember(number * self.per_page + 1)
+        return self._build_page(
+            rows[1:], max(number, 2),
+            has_next=True,
+            has_previous=True,
+        )
+
+    def fetch(self, limit, offset=0, after=None, before=None):
+        """Возвращает до limit записей в порядке сортировки пагинатора.
+
+        Для before записи выбираются в обратном порядке от ключа
+        и разворачиваются, так что результат всегда упорядочен
+        как ordering.
+        """
+        if after is not None:
+            queryset = self.object_list.filter(self._keyset(after))
+            return list(queryset[:limit])
+        if before is not None:
+            queryset = self.object_list.filter(
+                self._keyset(before, forward=False)
+            ).order_by(*self._reversed_ordering())
+            return list(queryset[:limit])[::-1]
+        return list(self.object_list[offset:offset + limit])
+
+    def encode_cursor(self, obj, number):
+        values = [
+            self._dump(self._value(obj, field)) for field in self.ordering
+        ]
+        raw = json.dumps(values + [number], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа и номер страницы из курсора."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            *values, number = raw
+            if len(values) != len(self.ordering) or int(number) < 1:
+                raise ValueError
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (
+            binascii.Error, ValueError, TypeError, ValidationError
+        ):
+            raise InvalidCursor
+        return values, int(number)
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        if not has_next:
+            # Прочитан конец выборки: число записей известно точно,
+            # и оценка больше не задает число страниц и окно ссылок.
+            self.estimate = None
+            self._count = self._known_count
+        page = self._get_page(rows, number, self)
+        page.has_next = lambda: has_next
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], number + 1) if has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], number - 1) if has_previous else None
+        )
+        return page
+
+    def _remember(self, known_count):
+        self._known_count = max(self._known_count, known_count)
+
+    def _keyset(self, values, forward=True):
+        """Условие «строго после ключа» в порядке сортировки.
+
+        Для ordering (-pub_date, -pk) это
+        pub_date <= d AND (pub_date < d OR (pub_date = d AND pk < id)).
+        Первое условие избыточно, но по нему СУБД начинает чтение
+        индекса с ключа, а не с начала.
+        """
+        query = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+            for previous, value in zip(self.ordering[:index], values):
+                condition &= Q(**{previous.lstrip('-'): value})
+            query |= condition
+        leading = self.ordering[0]
+        lookup = 'lte' if leading.startswith('-') == forward else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{lookup}': values[0]}) & query
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        name = name.lstrip('-')
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    @staticmethod
+    def _value(obj, field):
+        return getattr(obj, field.lstrip('-'))
+
+    @staticmethod
+    def _dump(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
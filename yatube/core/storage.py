@@ -0,0 +1,61 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла — SHA-256 его содержимого.
+
+    Загрузка пишется во временный файл рядом с целевым каталогом
+    и хешируется по мере чтения, без второго прохода по файлу.
+    Одинаковые загрузки получают одно имя (каталог из upload_to,
+    дайджест и расширение исходного имени) и хранятся один раз;
+    ссылками на файл служат поля моделей с этим именем.
+    """
+    hash_name = 'sha256'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory = os.path.dirname(name)
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest, temp_path = self._spool(content, self.path(directory))
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest + extension).replace('\\', '/')
+        if self.exists(name):
+            os.remove(temp_path)
+        else:
+            # Параллельная загрузка того же файла запишет то же самое.
+            file_move_safe(temp_path, self.path(name), allow_overwrite=True)
+            # mkstemp создает файл с правами 0600, как и у загрузок,
+            # которые Django переносит из временных файлов.
+            os.chmod(self.path(name), self.file_permissions_mode or 0o644)
+        return name
+
+    def _spool(self, content, directory):
+        """Копирует содержимое во временный файл и возвращает дайджест."""
+        digest = hashlib.new(self.hash_name)
+        descriptor, temp_path = tempfile.mkstemp(
+            prefix='.upload-', dir=directory
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return digest.hexdigest(), temp_path
@@ -0,0 +1,29 @@
+"""Запуск тестов: python manage.py test (TEST_RUNNER профиля test).
+
+Кэш процесса core.identity переживает откат транзакции TestCase,
+а pk откатанных строк выдаются снова, поэтому перед каждым тестом
+кэш очищается. Для pytest то же делает conftest.py в корне
+репозитория.
+"""
+import unittest
+
+from django.test.runner import DiscoverRunner
+
+from . import identity
+
+
+def reset():
+    """Очищает кэш процесса, который не откатывается вместе с БД."""
+    identity.clear()
+
+
+class Runner(DiscoverRunner):
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+
+        class Result(base):
+            def startTest(self, test):
+                reset()
+                super().startTest(test)
+
+        return Result
@@ -1,4 +1,22 @@
-from django.test import TestCase
+import importlib
+import os
+import sys
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import cache as page_cache
+from posts.models import Group
+
+from . import db, identity, metrics, warmup
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +24,263 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.url = reverse('metrics')
+
+    def test_endpoint_is_protected(self):
+        """Метрики видят сотрудники и владелец токена."""
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(
+            self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code,
+            403
+        )
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        staff = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_requests_are_counted_per_view(self):
+        """Запросы попадают в гистограммы своего представления."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        for line in (
+            '# TYPE yatube_request_queries histogram',
+            'yatube_request_queries_count{view="posts:index"} 2',
+            'yatube_request_template_seconds_count{view="posts:index"} 2',
+            'yatube_request_queries_bucket{view="posts:index",le="+Inf"} 2',
+            'yatube_cache_requests_total'
+            '{view="posts:index",cache="page",result="hit"} 1',
+            'yatube_cache_requests_total'
+            '{view="posts:index",cache="page",result="miss"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, response.content.decode())
+
+    def test_query_budget(self):
+        """Превышение лимита запросов под тестами — ошибка."""
+        with override_settings(QUERY_BUDGETS={'posts:index': 1}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+        with override_settings(
+            QUERY_BUDGETS={'posts:index': 1}, QUERY_BUDGETS_ENFORCED=False
+        ):
+            self.assertEqual(
+                self.client.get(reverse('posts:index')).status_code, 200
+            )
+
+
+class TemplateWarmupTests(TestCase):
+    def test_templates_are_compiled_into_cached_loader(self):
+        """Все шаблоны каталога templates попадают в кэш загрузчика."""
+        config = settings.TEMPLATES[0]
+        names = warmup.template_names(config['DIRS'][0])
+        self.assertIn('posts/includes/post_card.html', names)
+        with override_settings(TEMPLATES=[{
+            **config,
+            'APP_DIRS': False,
+            'OPTIONS': {**config['OPTIONS'], 'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                ]),
+            ]},
+        }]):
+            self.assertEqual(warmup.warm_templates(), len(names))
+            engine, = warmup.cached_engines()
+            loader = engine.template_loaders[0]
+            self.assertEqual(len(loader.get_template_cache), len(names))
+            warmup.reset_templates()
+            self.assertFalse(loader.get_template_cache)
+
+    def test_nothing_is_compiled_without_cached_loader(self):
+        config = settings.TEMPLATES[0]
+        with override_settings(TEMPLATES=[{
+            **config,
+            'APP_DIRS': False,
+            'OPTIONS': {**config['OPTIONS'], 'loaders': [
+                'django.template.loaders.filesystem.Loader',
+            ]},
+        }]):
+            self.assertEqual(warmup.warm_templates(), 0)
+
+
+class SettingsProfileTests(TestCase):
+    def load_profile(self, name, **environ):
+        module = f'yatube.settings.{name}'
+        self.addCleanup(sys.modules.pop, module, None)
+        sys.modules.pop(module, None)
+        with mock.patch.dict(os.environ, environ):
+            return importlib.import_module(module)
+
+    def test_prod_profile_has_no_debug_tools(self):
+        prod = self.load_profile(
+            'prod', DJANGO_SECRET_KEY='secret', DB_CONN_MAX_AGE='30'
+        )
+        self.assertEqual(prod.PROFILE, 'prod')
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.SECRET_KEY, 'secret')
+        self.assertNotIn('debug_toolbar', prod.INSTALLED_APPS)
+        self.assertFalse(any(
+            'debug_toolbar' in middleware for middleware in prod.MIDDLEWARE
+        ))
+        self.assertEqual(prod.DATABASES['default']['CONN_MAX_AGE'], 30)
+        self.assertEqual(prod.SQLITE_PRAGMAS['journal_mode'], 'wal')
+
+    def test_dev_profile_adds_debug_toolbar(self):
+        dev = self.load_profile('dev')
+        self.assertTrue(dev.DEBUG)
+        self.assertIn('debug_toolbar', dev.INSTALLED_APPS)
+        self.assertEqual(settings.PROFILE, 'test')
+
+    def test_sqlite_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            previous, = cursor.fetchone()
+            with override_settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+                db.configure_sqlite(None, connection)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone(), (-1234,))
+            cursor.execute(f'PRAGMA cache_size = {previous}')
+
+
+class LRUCacheTests(TestCase):
+    def test_eviction_and_expiry(self):
+        now = [0]
+        lru = identity.LRUCache(clock=lambda: now[0])
+        lru.set('a', 1, maxsize=2)
+        lru.set('b', 2, maxsize=2)
+        self.assertEqual(lru.get('a', timeout=10), 1)
+        lru.set('c', 3, maxsize=2)
+        self.assertIs(lru.get('b', timeout=10), identity.MISSING)
+        now[0] = 10
+        self.assertIs(lru.get('a', timeout=10), identity.MISSING)
+        self.assertEqual(len(lru), 1)
+
+
+class IdentityCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Книги', slug='books', description='Про книги'
+        )
+
+    def test_lookups_are_cached_per_process(self):
+        first = identity.get(User, username='leo')
+        with self.assertNumQueries(0):
+            second = identity.get(User, username='leo')
+            by_pk = identity.get(User, pk=self.user.pk)
+        self.assertEqual(second, self.user)
+        self.assertEqual(by_pk.username, 'leo')
+        self.assertIsNot(first, second)
+
+    def test_saves_and_deletes_reset_entries(self):
+        identity.get(User, username='leo')
+        self.user.username = 'lev'
+        self.user.save()
+        with self.assertRaises(User.DoesNotExist):
+            identity.get(User, username='leo')
+        self.assertEqual(identity.get(User, username='lev').pk, self.user.pk)
+        identity.get(Group, slug='books')
+        self.group.delete()
+        with self.assertRaises(Group.DoesNotExist):
+            identity.get(Group, slug='books')
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if 'FROM "auth_user"' in query['sql']
+        ]
+
+    def test_session_user_and_profile_author_come_from_cache(self):
+        """Повторные запросы не читают пользователей из БД."""
+        self.client.force_login(self.user)
+        url = reverse('posts:profile', args=['leo'])
+        self.assertTrue(self.user_queries(url))
+        self.assertEqual(self.user_queries(url), [])
+        group_url = reverse('posts:group_list', args=['books'])
+        self.client.get(group_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(group_url)
+        self.assertFalse([
+            query for query in queries
+            if 'FROM "posts_group"' in query['sql']
+        ])
+
+    def test_cached_pages_see_changes_from_other_process(self):
+        """Страница, собранная после сдвига версий, не берет старые строки."""
+        group_url = reverse('posts:group_list', args=['books'])
+        profile_url = reverse('posts:profile', args=['leo'])
+        self.client.get(group_url)
+        self.client.get(profile_url)
+        # Другой процесс: строки меняются в БД, а сюда доходят только
+        # сдвиги версий строк и областей страниц в общем кэше.
+        Group.objects.filter(pk=self.group.pk).update(title='Повести')
+        User.objects.filter(pk=self.user.pk).update(first_name='Лев')
+        identity.bump(Group, self.group.pk)
+        identity.bump(User, self.user.pk)
+        page_cache.bump_pages(
+            page_cache.group_scope('books'), page_cache.author_scope('leo')
+        )
+        self.assertContains(self.client.get(group_url), 'Повести')
+        self.assertContains(self.client.get(profile_url), 'Лев')
+        # Новая версия страницы сохранена с новыми данными.
+        self.assertContains(self.client.get(group_url), 'Повести')
+
+
+class SessionUserTests(TestCase):
+    """Пользователь сессии из кэша процесса."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='leo', password='pw')
+        self.url = reverse('posts:follow_index')
+
+    def test_model_backend_sessions_stay_valid(self):
+        """Сессии ModelBackend загружаются через кэш без нового входа."""
+        self.assertTrue(self.client.login(username='leo', password='pw'))
+        self.assertEqual(
+            self.client.session['_auth_user_backend'],
+            'django.contrib.auth.backends.ModelBackend'
+        )
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertFalse([
+            query for query in queries
+            if 'FROM "auth_user"' in query['sql']
+        ])
+
+    def test_changes_in_other_process_apply_on_next_request(self):
+        """Блокировка и смена пароля видны, как только сдвинута версия."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Другой процесс: строка меняется в БД, а сюда доходит только
+        # сдвиг версии в общем кэше.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        identity.bump(User, self.user.pk)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.set_password('new')
+        User.objects.filter(pk=self.user.pk).update(
+            password=self.user.password
+        )
+        identity.bump(User, self.user.pk)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +21,20 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_export(request):
+    """Метрики процесса в формате Prometheus.
+
+    Доступны сотрудникам и по заголовку Authorization: Bearer
+    с токеном METRICS_TOKEN.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (
+        token and constant_time_compare(authorization, f'Bearer {token}')
+    ):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.registry.render(), content_type=metrics.CONTENT_TYPE
+    )
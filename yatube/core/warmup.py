@@ -0,0 +1,64 @@
+"""Компиляция шаблонов при старте процесса.
+
+Кэширующий загрузчик хранит скомпилированные шаблоны в памяти процесса,
+но заполняется только по мере запросов: первый запрос к каждой странице
+в каждом процессе WSGI-сервера читает и разбирает с диска ее шаблон,
+base.html и все подключаемые шаблоны. warm_templates при старте загружает
+все шаблоны из каталогов DIRS, и запросы получают их уже готовыми.
+"""
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directory):
+    """Имена шаблонов каталога относительно него, через /."""
+    names = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            path = os.path.relpath(os.path.join(root, file_name), directory)
+            names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def cached_engines():
+    """Движки Django-шаблонов, у которых включен кэширующий загрузчик."""
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is not None and any(
+            isinstance(loader, CachedLoader)
+            for loader in engine.template_loaders
+        ):
+            yield engine
+
+
+def warm_templates():
+    """Загружает шаблоны в кэш загрузчика; возвращает их число.
+
+    Без кэширующего загрузчика (DEBUG) загрузка ничего бы не сохранила,
+    поэтому такие движки пропускаются. Шаблон с ошибкой только
+    записывается в журнал: запрос к нему покажет ошибку, как и раньше.
+    """
+    loaded = 0
+    for engine in cached_engines():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Не удалось скомпилировать %s', name)
+                    continue
+                loaded += 1
+    return loaded
+
+
+def reset_templates():
+    """Очищает кэш скомпилированных шаблонов."""
+    for engine in cached_engines():
+        for loader in engine.template_loaders:
+            if isinstance(loader, CachedLoader):
+                loader.reset()
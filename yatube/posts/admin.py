@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
@@ -16,6 +19,27 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по поисковому индексу вместо LIKE по тексту.
+
+        Changelist показывает первые SEARCH_ADMIN_LIMIT совпадений,
+        отсортированные по релевантности, и разбивает их на страницы.
+        """
+        if not search_term:
+            return queryset, False
+        ids = search.SearchResults(search_term).ids(
+            settings.SEARCH_ADMIN_LIMIT
+        )
+        queryset = queryset.filter(pk__in=ids).annotate(
+            search_rank=search.ranking(ids)
+        )
+        return queryset, False
+
+    def get_ordering(self, request):
+        if request.GET.get(SEARCH_VAR):
+            return ['search_rank']
+        return super().get_ordering(request)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
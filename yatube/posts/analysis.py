@@ -0,0 +1,190 @@
+"""Анализ текста для поискового индекса постов.
+
+Анализатор — это токенизатор и цепочка фильтров из настройки
+SEARCH_ANALYZER; каждый фильтр принимает и возвращает итерируемое
+токенов. Текст поста анализируется один раз при индексации: в индексе
+хранятся уже готовые термины, а при поиске анализируется только запрос.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r'\w+')
+
+# Список стоп-слов Snowball для русского языка, ё заменена на е.
+STOP_WORDS = frozenset('''
+    а без более бы был была были было быть в вам вас весь во вот все
+    всего всех вы где да даже для до его ее если есть еще же за здесь
+    и из или им их к как ко когда кто ли либо мне может мы на надо наш
+    не него нее нет ни них но ну о об однако он она они оно от очень по
+    под при с со так также такой там те тем то того тоже той только
+    том ты у уже хотя чего чей чем что чтобы чье чья эта эти это я
+    вдруг вот ведь впрочем всегда всю говорил два другой зачем иногда
+    когда куда лучше между меня мой много можно моя наконец нельзя
+    никогда ничего нибудь ней ним над перед потом потому почти про раз
+    разве сам свою себе себя сейчас сказал сказала совсем теперь тогда
+    тот три тут уж хорошо чуть эти этого этой этом этот будто больше
+    будет чтоб куда всех
+'''.split())
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _by_length(*endings):
+    return sorted(set(endings), key=len, reverse=True)
+
+
+PERFECTIVE_GERUND = (
+    _by_length('в', 'вши', 'вшись'),
+    _by_length('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _by_length(
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    _by_length('ем', 'нн', 'вш', 'ющ', 'щ'),
+    _by_length('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), _by_length('ся', 'сь'))
+VERB = (
+    _by_length(
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    _by_length(
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = ((), _by_length(
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = ((), _by_length('ейш', 'ейше'))
+DERIVATIONAL = ((), _by_length('ост', 'ость'))
+
+
+def _regions(word):
+    """Начала областей RV, R1 и R2 алгоритма Snowball."""
+    rv = r1 = r2 = len(word)
+    for index, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r1, r2
+
+
+def _strip(word, start, groups):
+    """Отрезает самое длинное окончание, целиком лежащее в word[start:].
+
+    Окончания первой группы допускаются только после «а» или «я»,
+    которые остаются в слове.
+    """
+    after_a, plain = groups
+    candidates = sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in plain],
+        key=lambda candidate: len(candidate[0]), reverse=True
+    )
+    for ending, needs_a in candidates:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if needs_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut], True
+    return word, False
+
+
+def _strip_adjectival(word, rv):
+    word, found = _strip(word, rv, ((), ADJECTIVE))
+    if found:
+        word, _ = _strip(word, rv, PARTICIPLE)
+    return word, found
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка."""
+    rv, _, r2 = _regions(word)
+    word, found = _strip(word, rv, PERFECTIVE_GERUND)
+    if not found:
+        word, _ = _strip(word, rv, REFLEXIVE)
+        word, found = _strip_adjectival(word, rv)
+        if not found:
+            word, found = _strip(word, rv, VERB)
+        if not found:
+            word, _ = _strip(word, rv, NOUN)
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word, _ = _strip(word, r2, DERIVATIONAL)
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    word, found = _strip(word, rv, SUPERLATIVE)
+    if found:
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+    elif word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    return WORD_RE.findall(text)
+
+
+def lowercase(tokens):
+    return (token.lower() for token in tokens)
+
+
+def fold_yo(tokens):
+    return (token.replace('ё', 'е') for token in tokens)
+
+
+def remove_stop_words(tokens):
+    return (token for token in tokens if token not in STOP_WORDS)
+
+
+def russian_stem(tokens):
+    return (stem(token) for token in tokens)
+
+
+class Analyzer:
+    """Токенизатор и цепочка фильтров, заданные путями импорта."""
+    def __init__(self, tokenizer, filters=()):
+        self.tokenizer = import_string(tokenizer)
+        self.filters = [import_string(path) for path in filters]
+
+    def __call__(self, text):
+        tokens = self.tokenizer(text)
+        for token_filter in self.filters:
+            tokens = token_filter(tokens)
+        return list(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_analyzer():
+    return Analyzer(**settings.SEARCH_ANALYZER)
+
+
+@receiver(setting_changed)
+def reset_analyzer(setting, **kwargs):
+    if setting == 'SEARCH_ANALYZER':
+        get_analyzer.cache_clear()
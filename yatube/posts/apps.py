@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from core import identity
+        from . import signals  # noqa: F401
+        from .models import Group
+        identity.track(Group)
@@ -0,0 +1,178 @@
+"""Общие средства для команд-бенчмарков: отдельная БД и синтетика."""
+import contextlib
+import datetime as dt
+import itertools
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .bulk import bulk_insert, next_pk
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'война мир город дом река лес утро вечер письмо дорога книга музыка '
+    'море поезд друг работа школа сад окно зима лето весна осень кофе '
+    'кошка собака небо звезда песня праздник новость история'
+).split()
+
+
+@contextlib.contextmanager
+def isolated_database():
+    """Создает временную тестовую БД с миграциями и удаляет ее после.
+
+    Рабочая база не затрагивается: подключение переключается на БД
+    с префиксом test_, как при запуске тестов.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextlib.contextmanager
+def rolled_back():
+    """Все изменения внутри блока откатываются после выхода."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Перцентили выборки методом ближайшего ранга."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': 0.0 for point in points}
+    return {
+        f'p{point}': ordered[
+            min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))
+        ]
+        for point in points
+    }
+
+
+def timed(function, *args, **kwargs):
+    """Время выполнения вызова в миллисекундах и его результат."""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def power_law(items, exponent=1.1):
+    """Накопленные веса для rng.choices: элемент ранга r весит 1 / r ** s.
+
+    Накопленные веса считаются один раз, иначе каждый вызов
+    rng.choices(weights=...) заново суммировал бы все веса.
+    """
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(len(items))
+    ))
+
+
+def random_text(rng, words=(5, 40)):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(*words))).capitalize()
+
+
+def seed_users(count, prefix='bench'):
+    """Создает пользователей через bulk_create и возвращает их pk."""
+    bulk_insert(User, (User(username=f'{prefix}{i}') for i in range(count)))
+    return list(
+        User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def seed_posts(author_ids, per_author, rng):
+    """Создает посты авторов через bulk_create, без сигналов."""
+    bulk_insert(Post, (
+        Post(author_id=author_id, text=f'Пост {rng.random()}')
+        for author_id in author_ids
+        for _ in range(per_author)
+    ))
+
+
+def seed_groups(count, prefix='bench'):
+    """Создает группы и возвращает их pk."""
+    bulk_insert(Group, (
+        Group(title=f'Группа {i}', slug=f'{prefix}-{i}', description='')
+        for i in range(count)
+    ))
+    return list(
+        Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def seed_feed(author_ids, group_ids, count, rng, images=0.1, days=365):
+    """Создает count постов с датами за последние days дней.
+
+    Авторы и группы выбираются по степенному закону, часть постов
+    без группы. Порядок авторов перемешан: самые активные авторы
+    не совпадают с самыми популярными в power_law_follows, иначе
+    их посты заняли бы почти все ленты подписок. Даты растут вместе
+    с pk, как у настоящих постов. Возвращает диапазон pk постов.
+    """
+    author_ids = rng.sample(author_ids, len(author_ids))
+    authors = power_law(author_ids)
+    groups = power_law(group_ids)
+    first = next_pk(Post)
+    start = timezone.now() - dt.timedelta(days=days)
+    step = dt.timedelta(days=days) / max(count, 1)
+
+    def posts():
+        for index in range(count):
+            group_id = None
+            if group_ids and rng.random() < 0.7:
+                group_id = rng.choices(group_ids, cum_weights=groups)[0]
+            yield Post(
+                pk=first + index,
+                author_id=rng.choices(author_ids, cum_weights=authors)[0],
+                group_id=group_id,
+                text=random_text(rng),
+                image=f'posts/{index}.jpg' if rng.random() < images else '',
+                pub_date=start + step * index,
+            )
+
+    bulk_insert(Post, posts(), dated=True)
+    return range(first, first + count)
+
+
+def seed_comments(author_ids, post_ids, count, rng, skew=3):
+    """Создает комментарии; свежие посты получают больше.
+
+    Индекс поста с конца — len * u ** skew для равномерного u: без
+    таблицы весов, которая для миллионов постов заняла бы сотни МБ.
+    """
+    bulk_insert(Comment, (
+        Comment(
+            author_id=rng.choice(author_ids),
+            post_id=post_ids[-1 - int(len(post_ids) * rng.random() ** skew)],
+            text=random_text(rng, (1, 15)),
+        )
+        for _ in range(count)
+    ))
+
+
+def power_law_follows(user_ids, follows_per_user, rng, exponent=1.1):
+    """Граф подписок со степенным распределением популярности авторов.
+
+    Автор с рангом r выбирается с вероятностью, пропорциональной
+    1 / r ** exponent, поэтому несколько авторов собирают
+    большую часть подписчиков.
+    """
+    weights = power_law(user_ids, exponent)
+
+    def follows():
+        for user_id in user_ids:
+            authors = set(rng.choices(
+                user_ids, cum_weights=weights, k=follows_per_user
+            ))
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    return bulk_insert(Follow, follows())
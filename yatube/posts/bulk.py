@@ -0,0 +1,93 @@
+"""Массовая вставка строк через bulk_create, в обход сигналов.
+
+Сигналы не срабатывают, поэтому после вставки счетчики, ленты,
+поисковый индекс и миниатюры нужно пересобрать (см. import_data).
+"""
+import contextlib
+import itertools
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Размер порции объектов для bulk_create: bulk_create собирает все
+# переданные объекты в список, поэтому миллионы строк передаются частями.
+INSERT_CHUNK = 10000
+
+
+def chunks(iterable, size):
+    """Списки по size элементов из итератора, без чтения его целиком."""
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def bulk_insert(model, objects, dated=False):
+    """Сохраняет объекты из итератора порциями по INSERT_CHUNK.
+
+    При dated сохраняются заданные даты pub_date (см. bulk_create_dated).
+    """
+    inserted = 0
+    with transaction.atomic():
+        for chunk in chunks(objects, INSERT_CHUNK):
+            if dated:
+                bulk_create_dated(model, chunk, batch_size=500)
+            else:
+                model.objects.bulk_create(chunk, batch_size=500)
+            inserted += len(chunk)
+    return inserted
+
+
+def bulk_create_dated(model, objects, batch_size=None, **options):
+    """bulk_create, сохраняющий заданные pub_date.
+
+    Объектам без даты ставится текущее время, как это сделал бы
+    auto_now_add (см. keep_pub_date).
+    """
+    now = timezone.now()
+    for obj in objects:
+        if obj.pub_date is None:
+            obj.pub_date = now
+    with keep_pub_date(model):
+        model.objects.bulk_create(objects, batch_size=batch_size, **options)
+
+
+@contextlib.contextmanager
+def keep_pub_date(model):
+    """Отключает auto_now_add у pub_date модели на время вставки.
+
+    Иначе bulk_create записал бы вместо заданных дат текущее время.
+    Флаг поля общий для всего процесса, поэтому вставка с ним ведется
+    только из команд импорта и замеров, которые не обслуживают запросы.
+    """
+    field = model._meta.get_field('pub_date')
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+def next_pk(model):
+    """Первый свободный pk.
+
+    bulk_create на SQLite не возвращает pk созданных строк, поэтому
+    pk назначаются заранее, начиная с этого значения.
+    """
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def reset_sequences(*models):
+    """Сдвигает последовательности pk после вставки с явными pk.
+
+    На PostgreSQL последовательность не знает о таких строках,
+    и следующий обычный INSERT получил бы занятый pk.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
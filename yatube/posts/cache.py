@@ -0,0 +1,173 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.metrics import record_cache
+
+from . import thumbnails
+from .models import Group, Post, User
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+# Варианты карточки на разных страницах: на странице группы группа
+# не показывается, в профиле имя автора не ссылка.
+CARD_VARIANTS = {
+    'feed': {'author_link': True, 'with_group': True},
+    'group': {'author_link': True, 'with_group': False},
+    'profile': {'author_link': False, 'with_group': True},
+}
+
+
+def card_key(post_id, version, variant):
+    return f'post_card:{variant}:{post_id}:{version}'
+
+
+def render_cards(posts, variant):
+    """Подставляет в post.card готовую разметку карточек.
+
+    Карточки страницы читаются из кэша одним get_many; отсутствующие
+    рендерятся и сохраняются одним set_many. Ключ содержит версию
+    поста, поэтому после изменения поста, автора или группы старая
+    карточка просто перестает использоваться.
+    """
+    keys = {card_key(post.pk, post.version, variant): post for post in posts}
+    cached = cache.get_many(keys)
+    record_cache('card', len(cached), len(keys) - len(cached))
+    thumbnails.prefetch(
+        post.image for key, post in keys.items() if key not in cached
+    )
+    rendered = {}
+    for key, post in keys.items():
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(
+                CARD_TEMPLATE, {'post': post, **CARD_VARIANTS[variant]}
+            )
+            rendered[key] = html
+        post.card = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_TIMEOUT)
+    return posts
+
+
+def forget_cards(post):
+    """Удаляет карточки поста во всех вариантах."""
+    cache.delete_many(
+        [card_key(post.pk, post.version, variant) for variant in CARD_VARIANTS]
+    )
+
+
+def bump_versions(posts):
+    """Сдвигает версии карточек постов одним UPDATE."""
+    posts.update(version=F('version') + 1)
+
+
+def bump_group(group):
+    bump_versions(Post.objects.filter(group=group))
+
+
+def bump_author(user):
+    bump_versions(Post.objects.filter(author=user))
+
+
+def _version_key(scope):
+    return f'page_version:{scope}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def page_versions(scopes):
+    """Текущие версии областей кэша страниц.
+
+    Отсутствующая версия заводится по текущему времени, поэтому после
+    вытеснения ключа версии она не совпадет ни с одной из прежних
+    и старые страницы не вернутся.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            now = _new_version()
+            versions[key] = now if cache.add(key, now, None) else cache.get(
+                key, now
+            )
+    return [versions[key] for key in keys]
+
+
+def bump_pages(*scopes):
+    """Делает недействительными страницы, зависящие от областей.
+
+    Версия заменяется новой, а не увеличивается: у общего кэша в БД
+    incr не атомарен, и из двух одновременных сдвигов один потерялся бы.
+    """
+    version = _new_version()
+    cache.set_many(
+        {_version_key(scope): version for scope in set(scopes)}, None
+    )
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def bump_author_pages(*user_ids):
+    """Сдвигает версии профилей пользователей."""
+    usernames = User.objects.filter(
+        pk__in=user_ids
+    ).values_list('username', flat=True)
+    bump_pages(*(author_scope(username) for username in usernames))
+
+
+def bump_post_pages(author_id, *group_ids):
+    """Сдвигает версии страниц, на которых показывается пост."""
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    bump_pages('global', *(group_scope(slug) for slug in slugs))
+    bump_author_pages(author_id)
+
+
+def cache_anonymous_page(scopes):
+    """Кэширует страницу для гостей с учетом версий областей.
+
+    scopes(**kwargs) возвращает области, от которых зависит страница:
+    global, group:<slug> или author:<username>. Запись в любую из них сдвигает
+    версию, и ключ страницы меняется, поэтому страницы могут храниться
+    часами и при этом не устаревают после изменений.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            versions = page_versions(scopes(**kwargs))
+            raw_key = f'{request.get_full_path()}|{versions}'
+            key = 'page:' + hashlib.md5(raw_key.encode()).hexdigest()
+            cached = cache.get(key)
+            record_cache('page', cached is not None, cached is None)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    settings.PAGE_CACHE_TIMEOUT
+                )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _shift(deltas):
+    return {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+
+
+def bump_user(user_id, **deltas):
+    """Сдвигает счетчики пользователя одним UPDATE.
+
+    Если строки счетчиков еще нет, при увеличении она создается
+    с точными значениями; при уменьшении отсутствие строки
+    означает, что пользователь удаляется, и менять нечего.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **_shift(deltas)
+    )
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        rebuild_user_stats(User.objects.filter(pk=user_id))
+
+
+def bump_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(**_shift({'comments_count': delta}))
+
+
+def on_post(post, delta):
+    bump_user(post.author_id, posts_count=delta)
+
+
+def on_comment(comment, delta):
+    with transaction.atomic():
+        bump_user(comment.author_id, comments_count=delta)
+        bump_post(comment.post_id, delta)
+
+
+def on_follow(follow, delta):
+    with transaction.atomic():
+        bump_user(follow.user_id, following_count=delta)
+        bump_user(follow.author_id, followers_count=delta)
+
+
+def _count(model, field, outer='pk'):
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    counts = counts.values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def rebuild_user_stats(users, batch_size=1000):
+    """Пересчитывает счетчики пользователей, возвращает число исправленных."""
+    users = users.order_by('pk').annotate(**{
+        f'actual_{field}': _count(model, related)
+        for field, (model, related) in USER_COUNTERS.items()
+    })
+    fixed = 0
+    with transaction.atomic():
+        for batch in _batches(users.iterator(), batch_size):
+            existing = UserStats.objects.in_bulk([user.pk for user in batch])
+            created, changed = [], []
+            for user in batch:
+                stats = existing.get(user.pk)
+                if stats is None:
+                    stats = UserStats(user_id=user.pk)
+                    created.append(stats)
+                drifted = False
+                for field in USER_COUNTERS:
+                    actual = getattr(user, f'actual_{field}')
+                    if getattr(stats, field) != actual:
+                        setattr(stats, field, actual)
+                        drifted = True
+                if drifted and stats not in created:
+                    changed.append(stats)
+            UserStats.objects.bulk_create(created)
+            UserStats.objects.bulk_update(changed, list(USER_COUNTERS))
+            fixed += len(created) + len(changed)
+    return fixed
+
+
+def rebuild_post_counters(posts, batch_size=1000):
+    """Пересчитывает comments_count постов, возвращает число исправленных."""
+    drifted = posts.order_by().annotate(
+        actual=_count(Comment, 'post')
+    ).exclude(comments_count=F('actual')).only('comments_count')
+    fixed = 0
+    with transaction.atomic():
+        for batch in _batches(drifted.iterator(), batch_size):
+            for post in batch:
+                post.comments_count = post.actual
+            Post.objects.bulk_update(batch, ['comments_count'])
+            fixed += len(batch)
+    return fixed
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
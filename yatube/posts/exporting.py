@@ -0,0 +1,163 @@
+"""Потоковая выгрузка постов автора или группы.
+
+Записи читаются из БД итератором порциями по EXPORT_CHUNK_SIZE
+и сразу отдаются дальше, поэтому память не зависит от объема выгрузки.
+Поток NDJSON содержит все виды записей с полем kind и загружается
+командой import_data --stream.
+Поля записей совпадают с форматом команды import_data (см.
+posts.importing): архив ZIP содержит файлы users.ndjson, groups.ndjson,
+posts.ndjson и comments.ndjson, которые она загружает без изменений,
+и оригиналы изображений в каталоге images/ под их именами в хранилище
+(содержимое images/ копируется в MEDIA_ROOT).
+"""
+import io
+import json
+import time
+import zipfile
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+
+from .models import Comment, Group, Post, User
+
+# Сколько байт архива накапливать перед отдачей клиенту.
+ZIP_FLUSH_SIZE = 64 * 1024
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+
+class Export:
+    """Посты из queryset, их комментарии и связанные пользователи."""
+    def __init__(self, posts, chunk_size=None):
+        self.posts = posts.order_by()
+        self.chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
+    def _rows(self, queryset, *fields):
+        return queryset.values(*fields).iterator(chunk_size=self.chunk_size)
+
+    def users(self):
+        comments = Comment.objects.filter(post__in=self.posts)
+        users = User.objects.filter(
+            Q(pk__in=self.posts.values('author'))
+            | Q(pk__in=comments.values('author'))
+        ).order_by('pk')
+        yield from self._rows(users, 'username', 'first_name', 'last_name')
+
+    def groups(self):
+        groups = Group.objects.filter(
+            pk__in=self.posts.values('group')
+        ).order_by('pk')
+        yield from self._rows(groups, 'slug', 'title', 'description')
+
+    def posts_records(self):
+        for row in self._rows(
+            self.posts.order_by('pk'), 'pk', 'author__username',
+            'group__slug', 'text', 'pub_date', 'image'
+        ):
+            record = {
+                'id': row['pk'],
+                'author': row['author__username'],
+                'text': row['text'],
+                'pub_date': row['pub_date'].isoformat(),
+            }
+            if row['group__slug']:
+                record['group'] = row['group__slug']
+            if row['image']:
+                record['image'] = row['image']
+            yield record
+
+    def comments(self):
+        comments = Comment.objects.filter(post__in=self.posts).order_by('pk')
+        for row in self._rows(
+            comments, 'post', 'author__username', 'text', 'pub_date'
+        ):
+            yield {
+                'post': row['post'],
+                'author': row['author__username'],
+                'text': row['text'],
+                'pub_date': row['pub_date'].isoformat(),
+            }
+
+    def sections(self):
+        """Пары (вид записей, итератор записей) в порядке загрузки."""
+        return (
+            ('users', self.users()),
+            ('groups', self.groups()),
+            ('posts', self.posts_records()),
+            ('comments', self.comments()),
+        )
+
+    def images(self):
+        """Имена изображений постов, каждое один раз."""
+        names = self.posts.exclude(image='').order_by('image').values_list(
+            'image', flat=True
+        ).distinct()
+        return names.iterator(chunk_size=self.chunk_size)
+
+
+def ndjson_line(record):
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode()
+
+
+def stream_ndjson(export):
+    """Все записи одним потоком NDJSON; вид записи — в поле kind.
+
+    Поток загружает import_data --stream.
+    """
+    for kind, records in export.sections():
+        for record in records:
+            yield ndjson_line({'kind': kind, **record})
+
+
+class _Buffer(io.RawIOBase):
+    """Файл только для записи, из которого забирают накопленные байты.
+
+    Он не поддерживает seek, поэтому ZipFile пишет размеры записей
+    после их данных и не возвращается к уже отданным байтам.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def stream_zip(export, storage=None):
+    """Архив ZIP по частям: файлы NDJSON по видам записей и изображения."""
+    storage = storage or Post._meta.get_field('image').storage
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind, records in export.sections():
+            with archive.open(f'{kind}.ndjson', 'w', force_zip64=True) as out:
+                for record in records:
+                    out.write(ndjson_line(record))
+                    if buffer.size >= ZIP_FLUSH_SIZE:
+                        yield buffer.pop()
+        for name in export.images():
+            try:
+                source = storage.open(name)
+            except (OSError, SuspiciousFileOperation):
+                continue
+            # Изображения уже сжаты, поэтому хранятся без сжатия.
+            info = zipfile.ZipInfo(
+                f'images/{name}', time.localtime(time.time())[:6]
+            )
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w', force_zip64=True) as out:
+                for chunk in source.chunks(IMAGE_CHUNK_SIZE):
+                    out.write(chunk)
+                    if buffer.size >= ZIP_FLUSH_SIZE:
+                        yield buffer.pop()
+    # Остаток данных и оглавление архива, записанное при закрытии.
+    yield buffer.pop()
@@ -0,0 +1,144 @@
+"""Кэш подписок пользователей.
+
+Для каждого пользователя в кэше хранится отсортированный массив pk
+авторов, на которых он подписан (8 байт на подписку), так что проверки
+«подписан ли на автора» и «на кого из этих авторов подписан» — одно
+чтение кэша без запроса к БД, сколько бы авторов ни проверялось.
+Массив сбрасывается сигналами при изменении подписок пользователя
+и живет FOLLOW_SET_TIMEOUT секунд.
+Сброс виден другим процессам, только если кэш Django у них общий, как
+в профиле prod; с кэшем процесса срок жизни короткий.
+
+Подписка и отписка идемпотентны: повторную подписку отбрасывает
+уникальное ограничение unique_follow, а не предварительная проверка,
+поэтому одновременные запросы не создают дублей.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from core.metrics import record_cache
+
+from .models import Follow
+
+
+class FollowSet:
+    """Неизменяемое множество pk авторов поверх отсортированного массива."""
+    def __init__(self, ids):
+        self.ids = ids
+
+    @classmethod
+    def from_ids(cls, ids):
+        return cls(array('q', sorted(set(ids))))
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array('q')
+        ids.frombytes(data)
+        return cls(ids)
+
+    def to_bytes(self):
+        return self.ids.tobytes()
+
+    def __contains__(self, author_id):
+        index = bisect_left(self.ids, author_id)
+        return index < len(self.ids) and self.ids[index] == author_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _key(user_id):
+    return f'follows:{user_id}'
+
+
+def followed(user_ids):
+    """Словарь user_id -> FollowSet; промахи кэша — одним запросом."""
+    user_ids = set(user_ids)
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    result = {
+        keys[key]: FollowSet.from_bytes(data) for key, data in cached.items()
+    }
+    missing = user_ids - set(result)
+    record_cache('follows', len(result), len(missing))
+    if missing:
+        authors = {user_id: [] for user_id in missing}
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in=missing
+        ).values_list('user_id', 'author_id'):
+            authors[user_id].append(author_id)
+        sets = {
+            user_id: FollowSet.from_ids(ids)
+            for user_id, ids in authors.items()
+        }
+        cache.set_many(
+            {_key(user_id): ids.to_bytes() for user_id, ids in sets.items()},
+            settings.FOLLOW_SET_TIMEOUT
+        )
+        result.update(sets)
+    return result
+
+
+def followed_by(user):
+    """Авторы, на которых подписан пользователь; для гостя — пусто."""
+    if not user.is_authenticated:
+        return FollowSet.from_ids(())
+    return followed([user.pk])[user.pk]
+
+
+def following(user, author_ids):
+    """pk авторов из author_ids, на которых подписан пользователь."""
+    ids = followed_by(user)
+    return {author_id for author_id in author_ids if author_id in ids}
+
+
+def follows_any(user, author_ids):
+    """Подписан ли пользователь хотя бы на одного из авторов."""
+    ids = followed_by(user)
+    return any(author_id in ids for author_id in author_ids)
+
+
+def is_following(user, author):
+    return author.pk in followed_by(user)
+
+
+def follow(user, author):
+    """Подписывает user на author; возвращает False, если уже подписан.
+
+    На себя подписаться нельзя. Повторная подписка не проверяется
+    заранее: ее отбрасывает уникальное ограничение, а откат
+    до точки сохранения не затрагивает внешнюю транзакцию.
+    """
+    if user.pk == author.pk:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """Отписывает user от author; возвращает False, если подписки не было."""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
+
+
+def forget(*user_ids):
+    """Сбрасывает кэш подписок пользователей.
+
+    Кэш сбрасывается сразу и еще раз после фиксации транзакции:
+    иначе параллельный запрос мог бы успеть закэшировать подписки
+    до фиксации.
+    """
+    keys = [_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,4 +1,6 @@
 from django import forms
+
+from . import images, thumbnails
 from .models import Post, Comment
 
 
@@ -7,6 +9,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if 'image' in self.changed_data and image:
+            return images.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and post.image and 'image' in self.changed_data:
+            thumbnails.schedule(post.image.name)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
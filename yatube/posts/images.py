@@ -0,0 +1,131 @@
+"""Обработка изображений постов при загрузке.
+
+Размеры проверяются по заголовку файла до декодирования пикселей,
+поэтому «бомба распаковки» отклоняется, не заняв память. Остальные
+изображения уменьшаются до IMAGE_MAX_SIZE по большей стороне, теряют
+EXIF и другие метаданные и перекодируются: непрозрачные в прогрессивный
+JPEG, с прозрачностью в PNG; от анимации остается первый кадр. Pillow
+читает временный файл загрузки как поток, JPEG декодируется сразу
+в уменьшенном масштабе, а результат пишется во временный файл, который
+хранилище копирует порциями. Небольшие изображения без метаданных
+сохраняются как есть: перекодирование только ухудшило бы их.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image
+
+# Форматы, в которых изображение может храниться без перекодирования.
+KEPT_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+# Ключи Image.info, которые описывают кодирование, а не снимок; любые
+# другие (exif, xmp, comment, текстовые блоки PNG) — повод перекодировать.
+TECHNICAL_INFO = {
+    'adobe', 'adobe_transform', 'aspect', 'background', 'dpi', 'duration',
+    'gamma', 'icc_profile', 'interlace', 'jfif', 'jfif_density',
+    'jfif_unit', 'jfif_version', 'loop', 'progression', 'progressive',
+    'srgb', 'transparency', 'version',
+}
+# Режимы, которые масштабируются и кодируются без преобразования.
+DIRECT_MODES = {'L', 'RGB', 'LA', 'RGBA'}
+ORIENTATION = 0x0112
+# Значение тега Orientation -> поворот, возвращающий снимок в норму.
+TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def open_image(upload):
+    """Изображение с прочитанным заголовком; пиксели еще не декодированы."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Изображение слишком большое.', code='image_too_large'
+        )
+    except (OSError, SyntaxError):
+        raise ValidationError('Загрузите изображение.', code='invalid_image')
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+    return image
+
+
+def has_alpha(image):
+    return image.mode in ('LA', 'RGBA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def is_clean(image):
+    """Изображение можно сохранить без перекодирования."""
+    return (
+        image.format in KEPT_FORMATS
+        and max(image.size) <= settings.IMAGE_MAX_SIZE
+        and not getattr(image, 'is_animated', False)
+        and set(image.info) <= TECHNICAL_INFO
+    )
+
+
+def shrink(image):
+    """Первый кадр, уменьшенный до IMAGE_MAX_SIZE и повернутый по EXIF."""
+    method = TRANSPOSE.get(image.getexif().get(ORIENTATION))
+    if image.mode not in DIRECT_MODES:
+        # Палитру нельзя сглаживать при масштабировании.
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+    limit = settings.IMAGE_MAX_SIZE
+    # thumbnail декодирует JPEG сразу с уменьшением в 2–8 раз (draft).
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    if method is not None:
+        image = image.transpose(method)
+    return image
+
+
+def encode(image, output):
+    """Записывает image в output без метаданных; возвращает расширение."""
+    # Цветовой профиль не метаданные: без него цвета снимка изменятся.
+    options = {'icc_profile': image.info.get('icc_profile')}
+    if has_alpha(image):
+        image.save(output, 'PNG', optimize=True, **options)
+        return '.png'
+    image.save(
+        output, 'JPEG', quality=settings.IMAGE_QUALITY, optimize=True,
+        progressive=True, **options
+    )
+    return '.jpg'
+
+
+def normalize(upload):
+    """Файл для сохранения вместо upload: он сам или обработанная копия.
+
+    Бросает ValidationError, если upload не изображение или оно больше
+    IMAGE_MAX_PIXELS.
+    """
+    image = open_image(upload)
+    if is_clean(image):
+        upload.seek(0)
+        return upload
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        extension = encode(shrink(image), output)
+    except (OSError, ValueError):
+        output.close()
+        raise ValidationError('Загрузите изображение.', code='invalid_image')
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=name + extension)
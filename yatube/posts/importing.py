@@ -0,0 +1,294 @@
+"""Потоковая загрузка пользователей, групп, постов, комментариев и подписок.
+
+Файлы NDJSON (объект JSON в строке) или CSV с заголовком читаются
+построчно и загружаются порциями: строки порции проверяются
+clean_fields, затем сохраняются bulk_create в одной транзакции.
+Внешние ключи разрешаются по словарям в памяти: username -> pk,
+slug -> pk и id поста из файла -> pk, поэтому память растет только
+с числом ключей, а не строк.
+
+Записи читаются из файла на каждый вид или из одного потока NDJSON,
+где вид записи указан в поле kind (так выгружает posts.exporting).
+
+Поля записей:
+    users: username, first_name, last_name, email, password (хеш)
+    groups: slug, title, description
+    posts: id, author (username), group (slug), text, pub_date, image
+    comments: post (id из файла постов), author, text, pub_date
+    follows: user, author
+"""
+import csv
+import functools
+import itertools
+import json
+import operator
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import bulk_create_dated, chunks, next_pk, reset_sequences
+from .models import Comment, Follow, Group, Post, User
+
+# Порядок загрузки: каждая сущность ссылается только на предыдущие.
+KINDS = ('users', 'groups', 'posts', 'comments', 'follows')
+# Сколько отклоненных строк каждого вида запоминать для отчета.
+ERRORS_KEPT = 100
+
+
+def read_records(path):
+    """Пары (номер строки, запись) из файла NDJSON или CSV.
+
+    Пустые значения CSV считаются отсутствующими.
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if os.path.splitext(path)[1].lower() == '.csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, {
+                    key: value for key, value in row.items() if value != ''
+                }
+            return
+        for line, text in enumerate(source, 1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError as error:
+                    yield line, error
+
+
+def _kind(item):
+    _, record = item
+    return record.get('kind') if isinstance(record, dict) else None
+
+
+def read_stream(path):
+    """Пары (вид, записи вида) из потока NDJSON с полем kind.
+
+    Подряд идущие записи одного вида образуют одну пару. Виды должны
+    идти в порядке KINDS, как их выгружает stream_ndjson: иначе ссылки
+    на еще не загруженные записи будут отклонены. Строки без верного
+    kind возвращаются с видом None.
+    """
+    for kind, items in itertools.groupby(read_records(path), key=_kind):
+        if kind not in KINDS:
+            yield None, items
+            continue
+        yield kind, (
+            (line, {key: value for key, value in record.items()
+                    if key != 'kind'})
+            for line, record in items
+        )
+
+
+def parse_date(value):
+    if value is None:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValidationError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Importer:
+    """Загружает записи порциями и хранит словари ключей между файлами."""
+    def __init__(self, batch_size=500, chunk_size=10000, strict=False):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.strict = strict
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.posts = {}
+        self.next_pks = {}
+        self.first_pks = {}
+        # Вставленные pk модели: отрезки [первый, последний].
+        self.inserted = {}
+        # Области кэша страниц, которые изменил импорт.
+        self.authors = set()
+        self.slugs = set()
+        self.images = False
+        # Пользователи, чьи подписки изменил импорт.
+        self.followers = set()
+
+    def load(self, kind, records):
+        """Загружает записи вида kind.
+
+        Возвращает число принятых и отклоненных строк и первые
+        ERRORS_KEPT ошибок в виде пар (номер строки, текст). Повторные
+        подписки принимаются, но не вставляются: их отбрасывает
+        уникальное ограничение.
+        """
+        model, build, exclude = {
+            'users': (User, self.build_user, ()),
+            'groups': (Group, self.build_group, ()),
+            'posts': (Post, self.build_post, ('author', 'group')),
+            'comments': (Comment, self.build_comment, ('author', 'post')),
+            'follows': (Follow, self.build_follow, ('user', 'author')),
+        }[kind]
+        loaded, rejected, errors = 0, 0, []
+        for chunk in chunks(records, self.chunk_size):
+            objects = []
+            for line, record in chunk:
+                try:
+                    if not isinstance(record, dict):
+                        raise ValidationError(f'Неверная запись: {record}')
+                    instance = build(record)
+                    instance.clean_fields(exclude=exclude)
+                    self.register(kind, record, instance)
+                except (KeyError, ValidationError) as error:
+                    if self.strict:
+                        raise ValidationError(f'{kind}:{line}: {error}')
+                    rejected += 1
+                    if len(errors) < ERRORS_KEPT:
+                        errors.append((line, describe(error)))
+                    continue
+                objects.append(instance)
+            with transaction.atomic():
+                if model in (User, Group):
+                    model.objects.bulk_create(
+                        objects, batch_size=self.batch_size
+                    )
+                else:
+                    bulk_create_dated(
+                        model, objects, batch_size=self.batch_size,
+                        ignore_conflicts=model is Follow
+                    )
+            self.record(model, objects)
+            loaded += len(objects)
+        if model in self.next_pks:
+            reset_sequences(model)
+        return loaded, rejected, errors
+
+    def allocate(self, model):
+        """Следующий pk модели: bulk_create на SQLite не возвращает pk."""
+        if model not in self.next_pks:
+            self.next_pks[model] = self.first_pks[model] = next_pk(model)
+        pk = self.next_pks[model]
+        self.next_pks[model] += 1
+        return pk
+
+    def record(self, model, objects):
+        """Запоминает pk вставленных объектов отрезками подряд идущих.
+
+        pk назначаются подряд, поэтому отрезков немного: новый
+        начинается только после отклоненных строк.
+        """
+        runs = self.inserted.setdefault(model, [])
+        for pk in sorted(obj.pk for obj in objects):
+            if runs and runs[-1][1] + 1 == pk:
+                runs[-1][1] = pk
+            else:
+                runs.append([pk, pk])
+
+    def imported(self, model):
+        """Строки модели, вставленные импортом.
+
+        Отбираются по pk, которые импорт вставил сам: строки, созданные
+        в это время другими запросами, сюда не попадают.
+        """
+        runs = self.inserted.get(model)
+        if not runs:
+            return model.objects.none()
+        return model.objects.filter(functools.reduce(operator.or_, (
+            Q(pk__range=run) for run in runs
+        )))
+
+    def build_user(self, record):
+        username = record['username']
+        if username in self.users:
+            raise ValidationError(f'Пользователь {username} уже есть.')
+        user = User(
+            pk=self.allocate(User),
+            username=username,
+            first_name=record.get('first_name', ''),
+            last_name=record.get('last_name', ''),
+            email=record.get('email', ''),
+            password=record.get('password', ''),
+        )
+        if not user.password:
+            user.set_unusable_password()
+        return user
+
+    def build_group(self, record):
+        slug = record['slug']
+        if slug in self.groups:
+            raise ValidationError(f'Группа {slug} уже есть.')
+        return Group(
+            pk=self.allocate(Group),
+            slug=slug,
+            title=record['title'],
+            description=record.get('description', ''),
+        )
+
+    def build_post(self, record):
+        group = record.get('group')
+        return Post(
+            pk=self.allocate(Post),
+            author_id=self.user(record['author']),
+            group_id=self.group(group) if group else None,
+            text=record.get('text', ''),
+            image=record.get('image', ''),
+            pub_date=parse_date(record.get('pub_date')),
+        )
+
+    def build_comment(self, record):
+        post = str(record['post'])
+        if post not in self.posts:
+            raise ValidationError(f'Нет поста {post} в файле постов.')
+        return Comment(
+            pk=self.allocate(Comment),
+            author_id=self.user(record['author']),
+            post_id=self.posts[post],
+            text=record.get('text', ''),
+            pub_date=parse_date(record.get('pub_date')),
+        )
+
+    def build_follow(self, record):
+        user, author = self.user(record['user']), self.user(record['author'])
+        if user == author:
+            raise ValidationError('Нельзя подписаться на себя.')
+        return Follow(
+            pk=self.allocate(Follow),
+            user_id=user, author_id=author,
+            pub_date=parse_date(record.get('pub_date')),
+        )
+
+    def register(self, kind, record, instance):
+        """Запоминает ключи проверенной записи для следующих строк."""
+        if kind == 'users':
+            self.users[instance.username] = instance.pk
+        elif kind == 'groups':
+            self.groups[instance.slug] = instance.pk
+        elif kind == 'posts':
+            if 'id' in record:
+                self.posts[str(record['id'])] = instance.pk
+            self.authors.add(record['author'])
+            if record.get('group'):
+                self.slugs.add(record['group'])
+            self.images = self.images or bool(instance.image)
+        elif kind == 'follows':
+            self.followers.add(instance.user_id)
+
+    def group(self, slug):
+        if slug not in self.groups:
+            raise ValidationError(f'Нет группы {slug}.')
+        return self.groups[slug]
+
+    def user(self, username):
+        if username not in self.users:
+            raise ValidationError(f'Нет пользователя {username}.')
+        return self.users[username]
+
+
+def describe(error):
+    if isinstance(error, KeyError):
+        return f'нет поля {error}'
+    return '; '.join(
+        f'{field}: {" ".join(messages)}'
+        for field, messages in error.message_dict.items()
+    ) if hasattr(error, 'error_dict') else ' '.join(error.messages)
@@ -0,0 +1,158 @@
+import json
+import random
+import statistics
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.warmup import cached_engines, reset_templates, warm_templates
+from posts.benchmarks import (
+    isolated_database, percentiles, seed_comments, seed_feed, seed_groups,
+    seed_users, timed
+)
+from posts.counters import rebuild_user_stats
+from posts.models import Group, Post, User
+
+CACHED_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+
+def cached_templates():
+    """TEMPLATES с кэширующим загрузчиком, как в профиле prod."""
+    return [
+        {
+            **config,
+            'APP_DIRS': False,
+            'OPTIONS': {**config['OPTIONS'], 'loaders': CACHED_LOADERS},
+        }
+        for config in settings.TEMPLATES
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первый запрос к странице после старта процесса '
+        '(шаблоны читаются и разбираются с диска) и запрос с уже '
+        'скомпилированными шаблонами кэширующего загрузчика. Данные '
+        'создаются во временной БД, кэш страниц очищается перед '
+        'каждым запросом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=30,
+                            help='Пар холодных и теплых запросов.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path',
+                            help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            results = self.run(options)
+        self.stdout.write(
+            f'Компиляция {results["warmup"]["templates"]} шаблонов при '
+            f'старте: p50 {results["warmup"]["ms"]["p50"]:.1f} мс'
+        )
+        for name, result in results['pages'].items():
+            cold, warm = result['cold'], result['warm']
+            self.stdout.write(
+                f'{name:>12}: холодный p50 {cold["total_ms"]["p50"]:.1f} мс '
+                f'(шаблоны {cold["template_ms"]["p50"]:.1f}), '
+                f'теплый p50 {warm["total_ms"]["p50"]:.1f} мс '
+                f'(шаблоны {warm["template_ms"]["p50"]:.1f})'
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def run(self, options):
+        pages = self.seed(options, random.Random(options['seed']))
+        client = Client(SERVER_NAME='localhost', REMOTE_ADDR='192.0.2.1')
+        with override_settings(TEMPLATES=cached_templates()):
+            warmups = []
+            for _ in range(options['rounds']):
+                reset_templates()
+                elapsed, count = timed(warm_templates)
+                warmups.append(elapsed)
+            samples = {
+                name: {'cold': [], 'warm': []} for name in pages
+            }
+            for _ in range(options['rounds']):
+                for name, url in pages.items():
+                    reset_templates()
+                    for state in ('cold', 'warm'):
+                        cache.clear()
+                        samples[name][state].append(self.request(client, url))
+            loaders = len(list(cached_engines()))
+        return {
+            'options': {
+                key: options[key] for key in ('posts', 'rounds', 'seed')
+            },
+            'warmup': {
+                'engines': loaders,
+                'templates': count,
+                'ms': percentiles(warmups),
+            },
+            'pages': {
+                name: {
+                    state: summarize(requests)
+                    for state, requests in states.items()
+                }
+                for name, states in samples.items()
+            },
+        }
+
+    def seed(self, options, rng):
+        """Создает посты и возвращает имя страницы -> URL."""
+        user_ids = seed_users(10)
+        group_ids = seed_groups(3)
+        post_ids = seed_feed(user_ids, group_ids, options['posts'], rng, 0)
+        seed_comments(user_ids, post_ids, options['posts'] * 2, rng)
+        rebuild_user_stats(User.objects.all())
+        post = Post.objects.order_by('-comments_count', 'pk').first()
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', args=[Group.objects.first().slug]
+            ),
+            'profile': reverse('posts:profile', args=[post.author.username]),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'about': reverse('about:author'),
+            'login': reverse('users:login'),
+        }
+
+    def request(self, client, url):
+        """Время ответа и время рендеринга шаблонов в мс.
+
+        Время шаблонов учитывает MetricsMiddleware, поэтому оно берется
+        из гистограммы, очищенной перед запросом.
+        """
+        metrics.registry.clear()
+        elapsed, response = timed(client.get, url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        return elapsed, sum(
+            histogram.sum * 1000
+            for (name, _), histogram in metrics.registry.histograms.items()
+            if name == 'yatube_request_template_seconds'
+        )
+
+
+def summarize(samples):
+    total = [elapsed for elapsed, _ in samples]
+    templates = [template_ms for _, template_ms in samples]
+    return {
+        'total_ms': {**percentiles(total), 'mean': statistics.mean(total)},
+        'template_ms': {
+            **percentiles(templates), 'mean': statistics.mean(templates)
+        },
+    }
@@ -0,0 +1,105 @@
+import json
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from posts import timeline
+from posts.benchmarks import (
+    isolated_database, percentiles, power_law_follows, rolled_back,
+    seed_posts, seed_users, timed
+)
+from posts.counters import rebuild_user_stats
+from posts.models import Post, TimelineEntry, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рассылку постов по лентам (push) и гибридную схему '
+        'на синтетическом графе подписок во временной БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--posts', type=int, default=5,
+                            help='Постов на автора в исходных данных.')
+        parser.add_argument('--threshold', type=int, default=100,
+                            help='Порог подписчиков для гибридной схемы.')
+        parser.add_argument('--writes', type=int, default=200)
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path',
+                            help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            results = self.run(options)
+        for name, result in results['strategies'].items():
+            self.stdout.write(
+                f'{name:>6}: строк ленты {result["timeline_rows"]}, '
+                f'вставок на пост {result["write_amplification"]:.1f} '
+                f'(макс. {result["max_write_amplification"]}), '
+                f'запись p95 {result["write_ms"]["p95"]:.2f} мс, '
+                f'чтение p50 {result["read_ms"]["p50"]:.2f} мс, '
+                f'p95 {result["read_ms"]["p95"]:.2f} мс'
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        user_ids = seed_users(options['users'])
+        seed_posts(user_ids, options['posts'], rng)
+        follows = power_law_follows(user_ids, options['follows'], rng)
+        rebuild_user_stats(User.objects.all())
+        results = {
+            'options': {
+                key: options[key] for key in (
+                    'users', 'follows', 'posts', 'threshold',
+                    'writes', 'reads', 'seed'
+                )
+            },
+            'follows': follows,
+            'strategies': {},
+        }
+        for name, threshold in (
+            ('push', None), ('hybrid', options['threshold'])
+        ):
+            with override_settings(TIMELINE_PULL_THRESHOLD=threshold):
+                with rolled_back():
+                    results['strategies'][name] = self.measure(
+                        user_ids, options
+                    )
+        return results
+
+    def measure(self, user_ids, options):
+        rng = random.Random(options['seed'])
+        timeline.rebuild()
+        rows = TimelineEntry.objects.count()
+        write_times, amplification = [], []
+        for author_id in rng.choices(user_ids, k=options['writes']):
+            before = TimelineEntry.objects.count()
+            elapsed, _ = timed(
+                Post.objects.create, author_id=author_id, text='Новый пост'
+            )
+            write_times.append(elapsed)
+            amplification.append(TimelineEntry.objects.count() - before)
+        read_times = []
+        for user_id in rng.choices(user_ids, k=options['reads']):
+            paginator = timeline.TimelinePaginator(user_id, 10, count=False)
+            elapsed, page = timed(paginator.get_page, 1)
+            read_times.append(elapsed)
+            if page.next_cursor:
+                elapsed, _ = timed(paginator.page_after, page.next_cursor)
+                read_times.append(elapsed)
+        return {
+            'timeline_rows': rows,
+            'write_amplification': statistics.mean(amplification),
+            'max_write_amplification': max(amplification),
+            'write_ms': percentiles(write_times),
+            'read_ms': percentiles(read_times),
+        }
@@ -0,0 +1,246 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core import db, metrics
+from posts import formatting, search, timeline
+from posts.benchmarks import (
+    isolated_database, percentiles, power_law, power_law_follows,
+    random_text, seed_comments, seed_feed, seed_groups, seed_users, timed
+)
+from posts.counters import rebuild_post_counters, rebuild_user_stats
+from posts.models import Comment, Group, Post, User
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Пиковый размер резидентной памяти процесса в МБ."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS — байты.
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную БД синтетическими данными и измеряет '
+        'страницы постов через тестовый клиент: перцентили времени '
+        'ответа, SQL-запросы на запрос и память процесса. Для миллионов '
+        'постов на SQLite задайте файл тестовой БД в DATABASES TEST NAME, '
+        'иначе она создается в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--images', type=float, default=0.1,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Измеряемых запросов на страницу.')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Запросов на страницу до измерений.')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Запрашивать страницы без входа.')
+        parser.add_argument('--search', action='store_true',
+                            help='Построить поисковый индекс.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path',
+                            help='Файл для результатов в JSON.')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения.')
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            results = self.run(options)
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as source:
+                baseline = json.load(source)['views']
+        for name, result in results['views'].items():
+            self.stdout.write(self.describe(
+                name, result, baseline.get(name) if baseline else None
+            ))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def describe(self, name, result, baseline):
+        latency = result['latency_ms']
+        line = (
+            f'{name:>12}: p50 {latency["p50"]:.1f} мс, '
+            f'p95 {latency["p95"]:.1f} мс, p99 {latency["p99"]:.1f} мс, '
+            f'запросов {result["queries"]["mean"]:.1f} '
+            f'(макс. {result["queries"]["max"]}), '
+            f'ошибок {result["errors"]}'
+        )
+        if baseline:
+            change = latency['p95'] / (baseline['latency_ms']['p95'] or 1)
+            queries = result['queries']['mean'] - baseline['queries']['mean']
+            line += f'; p95 {change - 1:+.0%}, запросов {queries:+.1f}'
+        return line
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        data = self.seed(options, rng)
+        seconds = time.perf_counter() - started
+        cache.clear()
+        client = Client(SERVER_NAME='localhost', REMOTE_ADDR='192.0.2.1')
+        if not options['anonymous']:
+            client.force_login(User.objects.get(pk=data['reader']))
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'profile': settings.PROFILE,
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+                'seed_seconds': round(seconds, 1),
+            },
+            'options': {
+                key: options[key] for key in (
+                    'users', 'posts', 'groups', 'comments', 'follows',
+                    'images', 'requests', 'warmup', 'anonymous', 'seed'
+                )
+            },
+            'views': {},
+        }
+        for name, scenario in self.scenarios(data).items():
+            results['views'][name] = self.measure(
+                client, scenario, rng, options
+            )
+        return results
+
+    def seed(self, options, rng):
+        user_ids = seed_users(options['users'])
+        group_ids = seed_groups(options['groups'])
+        post_ids = seed_feed(
+            user_ids, group_ids, options['posts'], rng, options['images']
+        )
+        seed_comments(user_ids, post_ids, options['comments'], rng)
+        power_law_follows(user_ids, options['follows'], rng)
+        rebuild_user_stats(User.objects.all())
+        rebuild_post_counters(Post.objects.all())
+        formatting.backfill(Post.objects.all())
+        formatting.backfill(Comment.objects.all())
+        timeline.rebuild()
+        if options['search']:
+            search.rebuild()
+        db.analyze()
+        return {
+            'authors': dict(
+                User.objects.filter(pk__in=user_ids).values_list(
+                    'pk', 'username'
+                )
+            ),
+            'author_ids': user_ids,
+            'slugs': list(
+                Group.objects.filter(pk__in=group_ids).order_by(
+                    'pk'
+                ).values_list('slug', flat=True)
+            ),
+            'post_ids': post_ids,
+            'reader': rng.choice(user_ids),
+        }
+
+    def scenarios(self, data):
+        """Страница -> функция, возвращающая (метод, URL, параметры)."""
+        authors = power_law(data['author_ids'])
+        groups = power_law(data['slugs'])
+
+        def index(rng):
+            return 'get', reverse('posts:index'), {
+                'page': rng.randint(1, 10)
+            }
+
+        def group_posts(rng):
+            slug = rng.choices(data['slugs'], cum_weights=groups)[0]
+            return 'get', reverse('posts:group_list', args=[slug]), {}
+
+        def profile(rng):
+            author_id = rng.choices(data['author_ids'], cum_weights=authors)
+            username = data['authors'][author_id[0]]
+            return 'get', reverse('posts:profile', args=[username]), {}
+
+        def post_detail(rng):
+            post_id = rng.choice(data['post_ids'])
+            return 'get', reverse('posts:post_detail', args=[post_id]), {}
+
+        def follow_index(rng):
+            return 'get', reverse('posts:follow_index'), {}
+
+        def post_create(rng):
+            return 'post', reverse('posts:post_create'), {
+                'text': random_text(rng)
+            }
+
+        scenarios = {
+            'index': index,
+            'group_posts': group_posts,
+            'profile': profile,
+            'post_detail': post_detail,
+            'follow_index': follow_index,
+            'post_create': post_create,
+        }
+        if not data['slugs']:
+            del scenarios['group_posts']
+        return scenarios
+
+    def measure(self, client, scenario, rng, options):
+        latencies, queries, errors = [], [], 0
+        for index in range(options['warmup'] + options['requests']):
+            method, url, params = scenario(rng)
+            with metrics.collect(metrics.Sample()) as sample:
+                elapsed, response = timed(
+                    getattr(client, method), url, params
+                )
+            if response.status_code >= 400:
+                errors += 1
+            if index >= options['warmup']:
+                latencies.append(elapsed)
+                queries.append(sample.queries)
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'latency_ms': {
+                **percentiles(latencies),
+                'mean': statistics.mean(latencies) if latencies else 0.0,
+            },
+            'queries': {
+                'mean': statistics.mean(queries) if queries else 0,
+                'max': max(queries, default=0),
+            },
+            'peak_rss_mb': peak_rss_mb(),
+        }
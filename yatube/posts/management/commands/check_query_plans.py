@@ -0,0 +1,162 @@
+import re
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# Строка плана SQLite без индекса: «SCAN posts_post» или «SCAN TABLE ...».
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\S+)')
+# Курсор следующей страницы ленты или порции комментариев в ссылке.
+NEXT_CURSOR = re.compile(r'\?after=([\w-]+)')
+
+# Без кэшей страницы выполняют все свои запросы, а клиент обращается
+# к ним с хоста testserver.
+CHECK_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    },
+    'IDENTITY_CACHE_TIMEOUT': 0,
+    'QUERY_BUDGETS_ENFORCED': False,
+    'ALLOWED_HOSTS': ['testserver'],
+}
+
+
+class Rollback(Exception):
+    """Откатывает данные, созданные для проверки."""
+
+
+def create_fixture():
+    """Автор с группой, постами и комментариями и его подписчик.
+
+    Постов и комментариев на один больше, чем помещается на страницу,
+    чтобы у лент и комментариев была следующая страница.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    author = User.objects.create_user(username=f'plan-author-{suffix}')
+    reader = User.objects.create_user(username=f'plan-reader-{suffix}')
+    group = Group.objects.create(
+        title='Проверка планов', slug=f'plan-{suffix}', description=''
+    )
+    for number in range(settings.POSTS_PER_PAGE + 1):
+        post = Post.objects.create(
+            author=author, group=group, text=f'План запроса {number}'
+        )
+    for number in range(settings.COMMENTS_PER_PAGE + 1):
+        Comment.objects.create(
+            author=reader, post=post, text=f'Комментарий {number}'
+        )
+    Follow.objects.create(user=reader, author=author)
+    return author, reader, group, post
+
+
+def capture(client, url):
+    """Ответ страницы и ее SELECT-запросы к таблицам проекта.
+
+    Запросы к служебным таблицам СУБД (статистика для оценки числа
+    строк) не проверяются.
+    """
+    tables = connection.introspection.django_table_names()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    if response.status_code != 200:
+        raise CommandError(f'{url}: ответ {response.status_code}')
+    selects = [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].startswith('SELECT') and any(
+            connection.ops.quote_name(table) in query['sql']
+            for table in tables
+        )
+    ]
+    return response, list(dict.fromkeys(selects))
+
+
+def page_queries():
+    """Запросы страниц: имя страницы -> список SQL.
+
+    Страницы запрашиваются тестовым клиентом на временных данных,
+    которые потом откатываются, поэтому проверяется тот SQL, который
+    представления выполняют на самом деле.
+    """
+    pages = {}
+    try:
+        with override_settings(**CHECK_SETTINGS), transaction.atomic():
+            author, reader, group, post = create_fixture()
+            client = Client()
+            client.force_login(reader)
+            urls = {
+                'index': reverse('posts:index'),
+                'group_list': reverse('posts:group_list', args=[group.slug]),
+                'profile': reverse('posts:profile', args=[author.username]),
+                'post_detail': reverse('posts:post_detail', args=[post.pk]),
+                'follow_index': reverse('posts:follow_index'),
+                'search': reverse('posts:search') + '?q=запрос',
+            }
+            for name, url in urls.items():
+                response, pages[name] = capture(client, url)
+                match = NEXT_CURSOR.search(response.content.decode())
+                if name == 'post_detail':
+                    name = 'post_comments'
+                    url = reverse('posts:post_comments', args=[post.pk])
+                elif match:
+                    name = f'{name}: следующая страница'
+                if match:
+                    _, pages[name] = capture(
+                        client, f'{url}?after={match.group(1)}'
+                    )
+            raise Rollback
+    except Rollback:
+        pass
+    return pages
+
+
+def explain(sql):
+    """Строки плана запроса для текущей БД."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else (
+        'EXPLAIN '
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    if connection.vendor == 'sqlite':
+        return [line for line in plan if SQLITE_FULL_SCAN.match(line)]
+    return [line for line in plan if POSTGRES_FULL_SCAN.search(line)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницы на временных данных, выводит планы '
+        'их запросов (EXPLAIN QUERY PLAN) и завершается с ошибкой, '
+        'если какой-то из них читает таблицу целиком.'
+    )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queries in page_queries().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}:'))
+            for sql in queries:
+                plan = explain(sql)
+                scans = full_scans(plan)
+                style = self.style.ERROR if scans else self.style.SUCCESS
+                self.stdout.write(style(f'  {sql}'))
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if scans:
+                    failed.append(name)
+        if failed:
+            raise CommandError(
+                'Полное чтение таблицы в запросах: '
+                + ', '.join(dict.fromkeys(failed))
+            )
+        self.stdout.write(self.style.SUCCESS('Полных чтений таблиц нет.'))
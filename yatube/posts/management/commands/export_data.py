@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporting import Export, stream_ndjson, stream_zip
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы с комментариями и изображениями '
+        'в NDJSON или архив ZIP, не загружая их в память целиком.'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--user', help='Имя пользователя-автора.')
+        source.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--format', choices=('ndjson', 'zip'),
+                            default='ndjson')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Сколько строк читать из БД за раз (EXPORT_CHUNK_SIZE).'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            owner = User.objects.filter(username=options['user']).first()
+            posts = Post.objects.filter(author=owner)
+        else:
+            owner = Group.objects.filter(slug=options['group']).first()
+            posts = Post.objects.filter(group=owner)
+        if owner is None:
+            raise CommandError(
+                f'Не найдено: {options["user"] or options["group"]}.'
+            )
+        export = Export(posts, options['chunk_size'])
+        stream = stream_zip if options['format'] == 'zip' else stream_ndjson
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                self.write(stream(export), output)
+        else:
+            self.write(stream(export), sys.stdout.buffer)
+
+    def write(self, chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
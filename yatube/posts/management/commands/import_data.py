@@ -0,0 +1,143 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from django.db.models import Q
+
+from core import db
+from posts import cache, follows, formatting, search, timeline
+from posts.counters import rebuild_post_counters, rebuild_user_stats
+from posts.importing import KINDS, Importer, read_records, read_stream
+from posts.models import Comment, Follow, Post, User, UserStats
+
+TITLES = {
+    'users': 'Пользователи',
+    'groups': 'Группы',
+    'posts': 'Посты',
+    'comments': 'Комментарии',
+    'follows': 'Подписки',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии и подписки '
+        'из файлов NDJSON или CSV порциями через bulk_create и затем '
+        'пересобирает счетчики, ленты, поисковый индекс и миниатюры.'
+    )
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(
+                f'--{kind}', metavar='FILE',
+                help=f'{TITLES[kind]}: .ndjson, .jsonl или .csv.'
+            )
+        parser.add_argument(
+            '--stream', metavar='FILE',
+            help='Все виды записей в одном файле NDJSON с полем kind, '
+                 'как в выгрузке export_data --format=ndjson.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк вставлять одним INSERT.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько строк проверять и сохранять в одной транзакции.'
+        )
+        parser.add_argument('--strict', action='store_true',
+                            help='Остановиться на первой неверной строке.')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересобирать производные данные.')
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            options['batch_size'], options['chunk_size'], options['strict']
+        )
+        for kind in KINDS:
+            if options[kind]:
+                self.load(importer, kind, options[kind])
+        if options['stream']:
+            self.load_stream(importer, options['stream'])
+        if not options['skip_rebuild']:
+            self.rebuild(importer)
+
+    def load_stream(self, importer, path):
+        for kind, records in read_stream(path):
+            if kind is not None:
+                self.load(importer, kind, path, records)
+                continue
+            for line, record in records:
+                message = f'{path}:{line}: неверный вид записи: {record}'
+                if importer.strict:
+                    raise CommandError(message)
+                self.stderr.write(message)
+
+    def load(self, importer, kind, path, records=None):
+        started = time.perf_counter()
+        if records is None:
+            records = read_records(path)
+        try:
+            loaded, rejected, errors = importer.load(kind, records)
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+        for line, message in errors:
+            self.stderr.write(f'{path}:{line}: {message}')
+        elapsed = time.perf_counter() - started
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{TITLES[kind]}: принято {loaded}, отклонено {rejected}, '
+            f'{elapsed:.1f} с, {rate:.0f} строк/с.'
+        ))
+
+    def rebuild(self, importer):
+        """Пересобирает то, что при обычном сохранении делают сигналы.
+
+        Пересчитываются только загруженные строки и их пользователи,
+        а ленты дополняются только по затронутым подпискам.
+        """
+        new_posts = importer.imported(Post)
+        new_comments = importer.imported(Comment)
+        new_follows = importer.imported(Follow)
+        users = User.objects.filter(
+            Q(pk__in=importer.imported(User).values('pk'))
+            | Q(pk__in=new_posts.values('author_id'))
+            | Q(pk__in=new_comments.values('author_id'))
+            | Q(pk__in=new_follows.values('user_id'))
+            | Q(pk__in=new_follows.values('author_id'))
+        )
+        rebuild_user_stats(users)
+        timeline.promote(UserStats.objects.filter(user__in=users))
+        rebuild_post_counters(new_posts)
+        formatting.backfill(new_posts)
+        formatting.backfill(new_comments)
+        self.stdout.write(self.style.SUCCESS(
+            'Счетчики и HTML текстов пересобраны.'
+        ))
+        db.analyze()
+        # Записи лент вставляются с ignore_conflicts, поэтому достаточно
+        # дополнить ленты по новым подпискам и подпискам на авторов
+        # новых постов.
+        timeline.extend(Follow.objects.filter(
+            Q(pk__in=new_follows.values('pk'))
+            | Q(author_id__in=new_posts.values('author_id'))
+        ))
+        self.stdout.write(self.style.SUCCESS('Ленты подписок дополнены.'))
+        if new_posts.exists():
+            search.fill(search.get_index(), new_posts)
+            self.stdout.write(self.style.SUCCESS(
+                'Новые посты добавлены в поисковый индекс.'
+            ))
+        if importer.images:
+            call_command(
+                'thumbnails', since=importer.first_pks[Post], skip_gc=True,
+                stdout=self.stdout
+            )
+        follows.forget(*importer.followers)
+        cache.bump_pages(
+            'global',
+            *(cache.author_scope(username) for username in importer.authors),
+            *(cache.group_scope(slug) for slug in importer.slugs)
+        )
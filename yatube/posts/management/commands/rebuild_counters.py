@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_post_counters, rebuild_user_stats
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк обновлять за один запрос.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        users = rebuild_user_stats(User.objects.all(), batch_size)
+        posts = rebuild_post_counters(Post.objects.all(), batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: пользователей {users}, постов {posts}.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов индексировать за один раз.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        search.rebuild(batch_size)
+        index = search.get_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс пересобран ({type(index).__name__}).'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import formatting
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет HTML текстов постов и комментариев, сохраненных '
+        'в обход save: импортом, бенчмарком или до появления поля.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк обновлять за один запрос.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Разметить заново все тексты, а не только пустые.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        counts = []
+        for model in (Post, Comment):
+            rows = model.objects.all()
+            if not options['all']:
+                rows = rows.filter(text_html='')
+            counts.append(formatting.backfill(rows, batch_size))
+        self.stdout.write(self.style.SUCCESS(
+            'Размечено текстов: постов {}, комментариев {}.'.format(*counts)
+        ))
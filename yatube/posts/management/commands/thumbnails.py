@@ -0,0 +1,125 @@
+import contextlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import cache, thumbnails
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры для изображений всех постов в пуле процессов '
+        'и удаляет миниатюры и записи sorl, на которые посты не ссылаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько изображений читать из БД и отдавать пулу за раз.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов; по умолчанию по числу ядер, '
+                 '0 — без пула, в текущем процессе.'
+        )
+        parser.add_argument(
+            '--since', type=int, metavar='PK',
+            help='Только изображения постов с pk не меньше PK '
+                 '(так import_data обрабатывает новые посты).'
+        )
+        parser.add_argument('--skip-warm', action='store_true',
+                            help='Не создавать миниатюры.')
+        parser.add_argument('--skip-gc', action='store_true',
+                            help='Не удалять лишние миниатюры.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, что будет удалено.')
+
+    def posts(self):
+        posts = Post.objects.exclude(image='')
+        if self.since is not None:
+            posts = posts.filter(pk__gte=self.since)
+        return posts
+
+    def images(self, chunk_size):
+        """Имена изображений постов, порциями по chunk_size.
+
+        Порции читаются по ключу (имени) целиком, без открытого курсора:
+        в SQLite незавершенное чтение не дало бы процессам пула
+        записывать в хранилище ключей sorl.
+        """
+        names = self.posts().order_by('image').values_list(
+            'image', flat=True
+        ).distinct()
+        chunk = list(names[:chunk_size])
+        while chunk:
+            yield chunk
+            chunk = list(names.filter(image__gt=chunk[-1])[:chunk_size])
+
+    def handle(self, *args, chunk_size, workers, since, **options):
+        if since is not None and not options['skip_gc']:
+            raise CommandError(
+                'С --since нужен --skip-gc: остальные миниатюры '
+                'были бы удалены.'
+            )
+        self.since = since
+        if not options['skip_warm']:
+            self.warm(chunk_size, workers)
+        if not options['skip_gc']:
+            self.collect(chunk_size, options['dry_run'])
+
+    def warm(self, chunk_size, workers):
+        done = failed = 0
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            run = map
+            if workers != 0:
+                # Дочерние процессы не должны наследовать соединения с БД.
+                connections.close_all()
+                run = stack.enter_context(ProcessPoolExecutor(
+                    workers, initializer=django.setup
+                )).map
+            for chunk in self.images(chunk_size):
+                for name, error in run(thumbnails.warm, chunk):
+                    done += 1
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'{name}: {error}')
+        elapsed = time.perf_counter() - started
+        self.bump_cards()
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры: изображений {done}, ошибок {failed}, '
+            f'{elapsed:.1f} с, {rate:.1f} изобр./с.'
+        ))
+
+    def bump_cards(self):
+        """Сбрасывает карточки и страницы, собранные с заглушками."""
+        posts = self.posts()
+        cache.bump_versions(posts)
+        usernames = User.objects.filter(
+            posts__in=posts
+        ).values_list('username', flat=True).distinct()
+        slugs = Group.objects.filter(
+            posts__in=posts
+        ).values_list('slug', flat=True).distinct()
+        cache.bump_pages(
+            'global',
+            *(cache.author_scope(username) for username in usernames),
+            *(cache.group_scope(slug) for slug in slugs)
+        )
+
+    def collect(self, chunk_size, dry_run):
+        images = [
+            name for chunk in self.images(chunk_size) for name in chunk
+        ]
+        stats = thumbnails.collect_garbage(images, dry_run=dry_run)
+        verb = 'будет удалено' if dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Очистка: {verb} файлов {stats["files"]} '
+            f'({stats["bytes"] / 2 ** 20:.1f} МБ), '
+            f'записей sorl {stats["entries"]}.'
+        ))
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    counts = counts.values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    users = User.objects.annotate(
+        actual_posts=_count(Post, 'author'),
+        actual_comments=_count(Comment, 'author'),
+        actual_followers=_count(Follow, 'author'),
+        actual_following=_count(Follow, 'user'),
+    )
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user.pk,
+                posts_count=user.actual_posts,
+                comments_count=user.actual_comments,
+                followers_count=user.actual_followers,
+                following_count=user.actual_following,
+            )
+            for user in users.iterator()
+        ),
+        batch_size=500
+    )
+    for post in Post.objects.annotate(
+        actual=_count(Comment, 'post')
+    ).filter(actual__gt=0).iterator():
+        Post.objects.filter(pk=post.pk).update(comments_count=post.actual)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post', 'author'], name='timeline_user_date_author_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timeline_author_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Растет при изменении поста, его автора или группы', verbose_name='Версия карточки'),
+        ),
+    ]
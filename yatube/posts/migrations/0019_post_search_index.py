@@ -0,0 +1,101 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:43
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Схема и заполнение индекса на момент миграции; модуль posts.search
+# может меняться, поэтому миграция от него не зависит.
+FTS_TABLE = 'posts_post_fts'
+FTS_SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+    f'USING fts5(terms, tokenize = "unicode61 remove_diacritics 0")'
+)
+TERM_LENGTH = 64
+BATCH_SIZE = 500
+WORD_RE = re.compile(r'\w+')
+
+
+def analyze(text):
+    return [word.lower() for word in WORD_RE.findall(text)]
+
+
+def fts_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def add_documents(connection, PostTerm, fts, documents):
+    if fts:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [(pk, ' '.join(terms)) for pk, terms in documents]
+            )
+        return
+    PostTerm.objects.bulk_create(
+        (
+            PostTerm(
+                term=term, post_id=pk, frequency=frequency, length=len(terms)
+            )
+            for pk, terms in documents
+            for term, frequency in Counter(
+                term[:TERM_LENGTH] for term in terms
+            ).items()
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    fts = fts_supported(connection)
+    if fts:
+        with connection.cursor() as cursor:
+            cursor.execute(FTS_SCHEMA)
+    PostTerm = apps.get_model('posts', 'PostTerm')
+    posts = apps.get_model('posts', 'Post').objects.order_by()
+    batch = []
+    for pk, text in posts.values_list('pk', 'text').iterator():
+        batch.append((pk, analyze(text)))
+        if len(batch) == BATCH_SIZE:
+            add_documents(connection, PostTerm, fts, batch)
+            batch = []
+    add_documents(connection, PostTerm, fts, batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_post_term'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:47
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    counts = model.objects.filter(**{field: OuterRef('user')}).order_by()
+    counts = counts.values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару и пересчитывает счетчики."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = Follow.objects.values('user', 'author').order_by().annotate(
+        first=Min('pk'), total=Count('pk')
+    ).filter(total__gt=1)
+    users = set()
+    for pair in duplicates.iterator():
+        Follow.objects.filter(
+            user=pair['user'], author=pair['author']
+        ).exclude(pk=pair['first']).delete()
+        users.update((pair['user'], pair['author']))
+    UserStats.objects.filter(user__in=users).update(
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_reanalyze_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
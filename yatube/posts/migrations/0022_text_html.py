@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_feed_indexes_unique_follow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Заполняется при сохранении, см. posts.formatting', verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Заполняется при сохранении, см. posts.formatting', verbose_name='Текст в HTML'),
+        ),
+    ]
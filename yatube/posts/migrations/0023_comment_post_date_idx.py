@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_text_html'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date', 'id'], name='comment_post_date_idx'),
+        ),
+    ]
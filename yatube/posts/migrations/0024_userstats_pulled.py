@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    """До поля pulled авторами pulled были все, кто набрал порог."""
+    threshold = getattr(settings, 'TIMELINE_PULL_THRESHOLD', None)
+    if threshold is None:
+        return
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=threshold
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_comment_post_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='Посты читаются лентой'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
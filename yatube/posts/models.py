@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -16,11 +17,39 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    feed_fields = (
+        'text', 'text_html', 'pub_date', 'image', 'version',
+        'author', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group', 'group__slug', 'group__title',
+    )
+
+    def feed(self):
+        """Посты для лент: автор и группа загружаются одним запросом."""
+        return self.select_related('author', 'group').only(*self.feed_fields)
+
+    def detail(self):
+        """Пост для отдельной страницы: вместе со счетчиками автора."""
+        return self.select_related(
+            'author', 'author__stats', 'group'
+        ).only(
+            *self.feed_fields, 'comments_count',
+            'author__stats__posts_count',
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст',
         help_text='Текст вашего поста'
     )
+    text_html = models.TextField(
+        verbose_name='Текст в HTML',
+        blank=True,
+        editable=False,
+        help_text='Заполняется при сохранении, см. posts.formatting'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,22 +66,67 @@ class Post(CreatedModel):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
+        db_index=True,
         help_text='Загрузите сюда вашу картинку'
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия карточки',
+        default=0,
+        editable=False,
+        help_text='Растет при изменении поста, его автора или группы'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты читаются по ключу (pub_date, id) в порядке убывания.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentQuerySet(models.QuerySet):
+    def with_authors(self):
+        """Комментарии вместе с авторами, без запроса на каждого автора."""
+        return self.select_related('author').only(
+            'text', 'text_html', 'pub_date', 'post',
+            'author', 'author__username',
+            'author__first_name', 'author__last_name',
+        )
+
+
 class Comment(CreatedModel):
     text = models.TextField(
         verbose_name='Текст комментария',
         help_text='Текст вашего комментария'
     )
+    text_html = models.TextField(
+        verbose_name='Текст в HTML',
+        blank=True,
+        editable=False,
+        help_text='Заполняется при сохранении, см. posts.formatting'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -64,6 +138,17 @@ class Comment(CreatedModel):
         related_name='comments'
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        # Комментарии поста читаются порциями по ключу (pub_date, id).
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_date_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -79,3 +164,113 @@ class Follow(CreatedModel):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются сигналами при создании и удалении постов, комментариев
+    и подписок; разошедшиеся значения пересчитывает команда
+    rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов', default=0
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок', default=0
+    )
+    # Посты автора не рассылаются по лентам, а читаются при открытии
+    # ленты (см. posts.timeline.is_pulled).
+    pulled = models.BooleanField(
+        verbose_name='Посты читаются лентой', default=False
+    )
+
+    def __str__(self):
+        return f'Счетчики {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписчика.
+
+    Строки добавляются при публикации поста для каждого подписчика
+    автора и при подписке; дата публикации скопирована из поста,
+    чтобы лента читалась диапазоном по индексу без соединения таблиц.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post', 'author'],
+                name='timeline_user_date_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class PostTerm(models.Model):
+    """Запись инвертированного индекса поиска по постам.
+
+    Используется, когда БД не поддерживает FTS5 (см. posts.search):
+    для каждого термина поста хранятся число вхождений и длина поста
+    в терминах, чтобы ранжировать совпадения по BM25.
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    frequency = models.PositiveIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_post_term'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.term}: {self.post_id}'
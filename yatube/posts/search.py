@@ -0,0 +1,288 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс хранит термины, полученные из текста поста анализатором
+SEARCH_ANALYZER: текст анализируется один раз при индексации.
+На SQLite с FTS5 это виртуальная таблица posts_post_fts с ранжированием
+bm25(), на остальных БД — таблица PostTerm, по которой релевантность
+считается в SQL той же формулой BM25. Индекс обновляется сигналами
+при сохранении и удалении постов, команда rebuild_search пересобирает
+его целиком.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, FloatField, IntegerField, Max, Sum,
+    Value, When
+)
+from django.db.models.functions import Cast
+
+from .analysis import get_analyzer
+from .models import Post, PostTerm
+from .utils import cached_count, posts_estimate
+
+FTS_TABLE = 'posts_post_fts'
+TERM_LENGTH = PostTerm._meta.get_field('term').max_length
+AVERAGE_LENGTH_KEY = 'search:average-length'
+
+_fts_tables = {}
+
+
+def analyze(text):
+    """Термины текста в порядке следования (см. posts.analysis)."""
+    return get_analyzer()(text)
+
+
+def fts_supported(connection):
+    """БД — SQLite, собранный с FTS5."""
+    if connection.settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def fts_available(connection):
+    """Таблица FTS5 создана миграцией; результат запоминается для БД."""
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        _fts_tables[key] = fts_supported(connection) and (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[key]
+
+
+class FtsIndex:
+    """Индекс в виртуальной таблице FTS5; rowid строки — pk поста."""
+    def __init__(self, connection):
+        self.connection = connection
+
+    def add(self, documents):
+        """Индексирует пары (pk, термины), заменяя прежние записи."""
+        rows = [(pk, ' '.join(terms)) for pk, terms in documents]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                rows
+            )
+
+    def remove(self, ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in ids]
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, limit, offset=0):
+        """Пары (pk, релевантность) по убыванию релевантности."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [self._match(terms), limit, offset]
+            )
+            return cursor.fetchall()
+
+    def count(self, terms):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)]
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _match(terms):
+        # Каждый термин в кавычках: синтаксис запросов FTS5 не действует.
+        return ' '.join(
+            '"{}"'.format(term.replace('"', '""')) for term in set(terms)
+        )
+
+
+class TermIndex:
+    """Инвертированный индекс в таблице PostTerm с ранжированием BM25.
+
+    Посты, содержащие все термины, отбираются и ранжируются в SQL
+    (GROUP BY post_id HAVING count = числу терминов), в Python
+    приходит только страница выдачи. Число постов и средняя длина
+    документа берутся из кэша на FEED_COUNT_TIMEOUT секунд.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, model=PostTerm):
+        self.model = model
+
+    def add(self, documents):
+        documents = list(documents)
+        self.remove(pk for pk, _ in documents)
+        self.model.objects.bulk_create(
+            (
+                self.model(
+                    term=term, post_id=pk, frequency=frequency,
+                    length=len(terms)
+                )
+                for pk, terms in documents
+                for term, frequency in Counter(
+                    term[:TERM_LENGTH] for term in terms
+                ).items()
+            ),
+            batch_size=500
+        )
+
+    def remove(self, ids):
+        self.model.objects.filter(post_id__in=list(ids)).delete()
+
+    def clear(self):
+        self.model.objects.all().delete()
+
+    def search(self, terms, limit, offset=0):
+        """Пары (pk, релевантность) по убыванию релевантности."""
+        terms = self._terms(terms)
+        frequencies = dict(
+            self.model.objects.filter(term__in=terms).values('term').annotate(
+                posts=Count('pk')
+            ).values_list('term', 'posts')
+        )
+        if not terms or len(frequencies) < len(terms):
+            return []
+        rows = self._matches(terms).annotate(
+            score=self._score(frequencies)
+        ).order_by('-score', '-post_id').values_list('post_id', 'score')
+        return list(rows[offset:offset + limit])
+
+    def count(self, terms):
+        terms = self._terms(terms)
+        return self._matches(terms).count() if terms else 0
+
+    @staticmethod
+    def _terms(terms):
+        return frozenset(term[:TERM_LENGTH] for term in terms)
+
+    def _matches(self, terms):
+        """Строки post_id постов, содержащих каждый из терминов."""
+        return self.model.objects.filter(term__in=terms).values(
+            'post_id'
+        ).annotate(found=Count('pk')).filter(found=len(terms))
+
+    def _score(self, frequencies):
+        """Сумма BM25 по терминам; frequencies: термин -> число постов."""
+        total, average = self._corpus()
+        idf = Case(
+            *(
+                When(term=term, then=Value(math.log(
+                    1 + (max(total, posts) - posts + 0.5) / (posts + 0.5)
+                )))
+                for term, posts in frequencies.items()
+            ),
+            output_field=FloatField()
+        )
+        frequency = Cast('frequency', FloatField())
+        length = Cast('length', FloatField())
+        return Sum(ExpressionWrapper(
+            idf * frequency * (self.k1 + 1) / (
+                frequency
+                + self.k1 * (1 - self.b + self.b * length / average)
+            ),
+            output_field=FloatField()
+        ))
+
+    def _corpus(self):
+        """Число постов и средняя длина документа в терминах."""
+        total = cached_count('global', Post.objects.feed(), posts_estimate)
+        average = cache.get(AVERAGE_LENGTH_KEY)
+        if average is None:
+            average = self.model.objects.values('post_id').annotate(
+                document=Max('length')
+            ).aggregate(average=Avg('document'))['average'] or 1
+            cache.set(AVERAGE_LENGTH_KEY, average, settings.FEED_COUNT_TIMEOUT)
+        return total, average
+
+
+def get_index():
+    if fts_available(connection):
+        return FtsIndex(connection)
+    return TermIndex()
+
+
+def fill(index, posts, batch_size=500):
+    """Индексирует посты из queryset порциями по batch_size."""
+    batch = []
+    for pk, text in posts.values_list('pk', 'text').iterator():
+        batch.append((pk, analyze(text)))
+        if len(batch) == batch_size:
+            index.add(batch)
+            batch = []
+    index.add(batch)
+
+
+def index_posts(posts):
+    get_index().add((post.pk, analyze(post.text)) for post in posts)
+
+
+def remove_posts(ids):
+    get_index().remove(ids)
+
+
+def rebuild(batch_size=500):
+    index = get_index()
+    index.clear()
+    fill(index, Post.objects.order_by(), batch_size)
+
+
+def ranking(ids):
+    """Выражение для order_by: место поста в списке ids."""
+    return Case(
+        *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+        default=len(ids),
+        output_field=IntegerField()
+    )
+
+
+class SearchResults:
+    """Результаты поиска в виде, понятном Paginator.
+
+    count() считает совпадения в индексе, срез загружает посты только
+    этой страницы одним запросом и сохраняет порядок релевантности.
+    """
+    def __init__(self, query, queryset=None):
+        self.terms = analyze(query)
+        self.queryset = Post.objects.feed() if queryset is None else queryset
+        self.index = get_index()
+
+    def count(self):
+        if not self.terms:
+            return 0
+        return self.index.count(self.terms)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, window):
+        if not isinstance(window, slice) or not self.terms:
+            return []
+        offset = window.start or 0
+        ranked = self.index.search(self.terms, window.stop - offset, offset)
+        posts = self.queryset.in_bulk([pk for pk, _ in ranked])
+        return [posts[pk] for pk, _ in ranked if pk in posts]
+
+    def ids(self, limit):
+        """pk первых limit постов по релевантности."""
+        if not self.terms:
+            return []
+        return [pk for pk, _ in self.index.search(self.terms, limit)]
@@ -0,0 +1,237 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from . import (
+    cache, counters, follows, formatting, search, thumbnails, timeline
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.on_post(instance, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.on_post(instance, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.on_comment(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.on_comment(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.on_follow(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.on_follow(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_set(sender, instance, raw=False, **kwargs):
+    if not raw:
+        follows.forget(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Выполняется после count_new_follow: счетчик уже увеличен.
+        timeline.on_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    # Выполняется после count_deleted_follow: счетчик уже уменьшен.
+    timeline.on_unfollow(instance)
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_version(sender, instance, raw=False, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if raw or not instance.pk or instance._state.adding:
+        return
+    if update_fields is None or 'version' in update_fields:
+        # Версию сдвигает и cache.bump_versions; прибавление к значению
+        # в памяти затерло бы сдвиг, сделанный после загрузки поста.
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Post)
+def reload_post_version(sender, instance, raw=False, **kwargs):
+    # Выполняется раньше обработчиков, читающих версию поста.
+    if not raw and hasattr(instance.version, 'resolve_expression'):
+        instance.refresh_from_db(fields=['version'])
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_cards(sender, instance, **kwargs):
+    cache.forget_cards(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def bump_group_cards(sender, instance, raw=False, **kwargs):
+    if not raw and not kwargs.get('created'):
+        cache.bump_group(instance)
+
+
+@receiver(post_save, sender=User)
+def bump_author_cards(sender, instance, created, raw=False, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # Вход пользователя сохраняет только last_login: карточки не меняются.
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    cache.bump_author(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = instance._previous_image = None
+    instance._previous_text = None
+    if instance.pk and not raw:
+        previous = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image', 'text').first()
+        if previous:
+            (
+                instance._previous_group_id,
+                instance._previous_image,
+                instance._previous_text,
+            ) = previous
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def render_text_html(sender, instance, raw=False, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if raw or update_fields is not None and 'text' not in update_fields:
+        return
+    # Неизмененный текст поста не размечается заново (remember_post_state
+    # выполняется раньше).
+    if instance.text_html and (
+        instance.text == getattr(instance, '_previous_text', None)
+    ):
+        return
+    instance.text_html = formatting.render_text(instance.text)
+
+
+@receiver(post_save, sender=Post)
+def bump_saved_post_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump_post_pages(
+            instance.author_id,
+            instance.group_id,
+            getattr(instance, '_previous_group_id', None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if not raw and previous and previous != instance.image.name:
+        transaction.on_commit(lambda: thumbnails.release(previous))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: thumbnails.release(name))
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_pages(sender, instance, **kwargs):
+    cache.bump_post_pages(instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump_pages('global', cache.group_scope(instance.slug))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, **kwargs):
+    instance._previous_username = None
+    update_fields = kwargs.get('update_fields')
+    if instance.pk and not raw and update_fields != frozenset({'last_login'}):
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def bump_user_pages(sender, instance, created, raw=False, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if raw or update_fields == frozenset({'last_login'}):
+        return
+    scopes = [
+        cache.author_scope(instance.username),
+        cache.author_scope(getattr(instance, '_previous_username', None)),
+    ]
+    if not created:
+        # Имя автора видно в карточках ленты и его групп.
+        slugs = Group.objects.filter(
+            posts__author=instance
+        ).values_list('slug', flat=True).distinct()
+        scopes += ['global', *(cache.group_scope(slug) for slug in slugs)]
+    cache.bump_pages(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_commenter_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump_author_pages(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump_author_pages(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    # Текст анализируется только при создании поста и его изменении.
+    if raw or instance.text == getattr(instance, '_previous_text', None):
+        return
+    search.index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
@@ -0,0 +1,15 @@
+from django import template
+from django.templatetags.static import static
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def rendition(image, name):
+    """URL готовой миниатюры или заглушки, пока миниатюра создается."""
+    thumbnail = thumbnails.lookup(image, name)
+    if thumbnail is None:
+        return static('img/placeholder.svg')
+    return thumbnail.url
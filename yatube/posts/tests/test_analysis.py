@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..analysis import get_analyzer, stem
+
+
+class AnalyzerTests(SimpleTestCase):
+    def test_russian_stemmer(self):
+        """Словоформы приводятся к основе по алгоритму Snowball."""
+        cases = {
+            'войны': 'войн',
+            'войною': 'войн',
+            'книгами': 'книг',
+            'красивейший': 'красив',
+            'организованность': 'организован',
+            'спрятавшись': 'спрята',
+            'умывались': 'умыва',
+            'стеклянный': 'стекля',
+            'python': 'python',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_default_chain(self):
+        """Регистр, ё и стоп-слова не влияют на термины."""
+        self.assertEqual(
+            get_analyzer()('Ёлки и ЕЛКА, а ещё ёжики'),
+            ['елк', 'елк', 'ежик']
+        )
+
+    @override_settings(SEARCH_ANALYZER={
+        'tokenizer': 'posts.analysis.tokenize',
+        'filters': ['posts.analysis.lowercase'],
+    })
+    def test_chain_is_configurable(self):
+        """Цепочка фильтров задается настройкой SEARCH_ANALYZER."""
+        self.assertEqual(
+            get_analyzer()('Ёлки и палки'), ['ёлки', 'и', 'палки']
+        )
@@ -0,0 +1,62 @@
+import random
+
+from django.test import TestCase
+
+from ..management.commands import bench_templates
+from ..management.commands.bench_views import Command
+from ..models import Comment, Follow, Post, TimelineEntry
+
+
+class ViewBenchmarkTests(TestCase):
+    options = {
+        'users': 20, 'posts': 200, 'groups': 3, 'comments': 100,
+        'follows': 3, 'images': 0.1, 'requests': 3, 'warmup': 1,
+        'anonymous': False, 'search': False, 'seed': 1,
+    }
+
+    def test_seeds_data_and_measures_views(self):
+        """Бенчмарк заполняет БД и измеряет все страницы без ошибок."""
+        results = Command().run(self.options)
+        self.assertEqual(Post.objects.count(), 200 + 4)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(list(results['views']), [
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'post_create',
+        ])
+        for name, result in results['views'].items():
+            with self.subTest(view=name):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries']['max'], 0)
+                self.assertLessEqual(
+                    result['latency_ms']['p50'], result['latency_ms']['p99']
+                )
+
+    def test_seeded_dates_follow_pk(self):
+        """Даты постов задаются генератором и растут вместе с pk."""
+        Command().seed(self.options, random.Random(1))
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertLess(dates[0], dates[-1])
+
+
+class TemplateBenchmarkTests(TestCase):
+    def test_measures_cold_and_warm_renders(self):
+        """Бенчмарк шаблонов проходит по страницам без ошибок."""
+        results = bench_templates.Command().run(
+            {'posts': 20, 'rounds': 2, 'seed': 1}
+        )
+        self.assertEqual(results['warmup']['engines'], 1)
+        self.assertGreater(results['warmup']['templates'], 0)
+        self.assertEqual(list(results['pages']), [
+            'index', 'group_list', 'profile', 'post_detail', 'about',
+            'login',
+        ])
+        for name, result in results['pages'].items():
+            with self.subTest(page=name):
+                self.assertGreater(result['cold']['template_ms']['p50'], 0)
+                self.assertGreater(result['warm']['total_ms']['p50'], 0)
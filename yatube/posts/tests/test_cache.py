@@ -0,0 +1,160 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import cache as page_cache
+from ..models import Group, Post
+
+User = get_user_model()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+class PostCardCacheTests(TestCase):
+    """Создаем пост в группе."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo')
+        self.group = Group.objects.create(
+            title='Группа поклонников графа',
+            slug='tolstoi',
+            description='Что-то о группе'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Старый текст', group=self.group
+        )
+        # Читатель авторизован, чтобы кэш страниц гостей не скрывал
+        # работу кэша карточек.
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='reader'))
+        self.url = reverse('posts:index')
+
+    def test_cards_are_cached_between_requests(self):
+        """Повторный запрос собирает ленту из кэша карточек."""
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Старый текст')
+
+    def test_cards_invalidated_on_changes(self):
+        """Изменение поста, группы или автора обновляет карточку."""
+        self.client.get(self.url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+        self.group.title = 'Клуб любителей прозы'
+        self.group.save()
+        self.assertContains(
+            self.client.get(self.url), 'Клуб любителей прозы'
+        )
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertContains(self.client.get(self.url), 'Лев')
+
+    def test_edit_keeps_concurrent_version_bump(self):
+        """Сохранение поста не затирает сдвиг версии из другого запроса."""
+        post = Post.objects.get(pk=self.post.pk)
+        version = post.version
+        page_cache.bump_group(self.group)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(post.version, version + 2)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, post.version
+        )
+
+    def test_login_does_not_invalidate_cards(self):
+        """Вход автора не сбрасывает его карточки."""
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Создаем автора с постом в группе."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo')
+        self.group = Group.objects.create(
+            title='Группа поклонников графа',
+            slug='tolstoi',
+            description='Что-то о группе'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Старый текст', group=self.group
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+
+    def test_pages_are_cached_for_guests(self):
+        """Повторный запрос гостя отдается из кэша без запросов к БД."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertContains(response, 'Старый текст')
+
+    def test_authorized_users_bypass_page_cache(self):
+        """Авторизованный пользователь получает страницу из view."""
+        self.client.get(self.urls[0])
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+    def test_changes_are_visible_immediately(self):
+        """Создание, правка и удаление поста сразу видны гостям."""
+        for url in self.urls:
+            self.client.get(url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        new_post = Post.objects.create(
+            author=self.user, text='Свежий пост', group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Новый текст')
+                self.assertContains(response, 'Свежий пост')
+        new_post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), 'Свежий пост')
+
+    def test_moving_post_updates_old_group(self):
+        """Пост, перенесенный в другую группу, пропадает со старой."""
+        url = self.urls[1]
+        self.client.get(url)
+        self.post.group = Group.objects.create(title='Другая', slug='other')
+        self.post.save()
+        self.assertNotContains(self.client.get(url), 'Старый текст')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'yatube_cache',
+}}, QUERY_BUDGETS_ENFORCED=False)
+class SharedPageCacheTests(TestCase):
+    """Кэш страниц в таблице БД, как в профиле prod.
+
+    Обращения к такому кэшу — тоже SQL-запросы, поэтому лимиты
+    запросов представлений здесь не проверяются.
+    """
+    def setUp(self):
+        call_command('createcachetable', verbosity=0)
+        self.user = User.objects.create_user(username='leo')
+        self.post = Post.objects.create(author=self.user, text='Старый текст')
+
+    def test_changes_invalidate_shared_pages(self):
+        """Сдвиг версии в общем кэше виден при следующем запросе."""
+        url = reverse('posts:index')
+        self.assertContains(self.client.get(url), 'Старый текст')
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
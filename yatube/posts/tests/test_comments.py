@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+
+class CommentPagesTests(TestCase):
+    """Создаем пост с 45 комментариями и пост с одним."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.quiet = Post.objects.create(author=cls.user, text='Тихий пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(45)
+        )
+        Comment.objects.create(post=cls.quiet, author=cls.user, text='Один')
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def detail(self, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:post_detail', args=[post.pk])
+            )
+        return response, len(queries)
+
+    def test_first_paint_does_not_depend_on_comments(self):
+        """Первая порция комментариев стоит одинаково для любого поста."""
+        response, queries = self.detail(self.post)
+        _, quiet_queries = self.detail(self.quiet)
+        self.assertEqual(queries, quiet_queries)
+        self.assertEqual(
+            self.texts(response), [f'Комментарий {i}' for i in range(20)]
+        )
+        self.assertContains(response, 'Показать еще комментарии')
+
+    def test_partial_returns_following_chunks(self):
+        """«Показать еще» отдает следующие порции без повторов."""
+        response, _ = self.detail(self.post)
+        texts = self.texts(response)
+        cursor = response.context['comments'].next_cursor
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        while cursor:
+            response = self.client.get(url, {'after': cursor})
+            self.assertTemplateNotUsed(response, 'base.html')
+            texts += self.texts(response)
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(texts, [f'Комментарий {i}' for i in range(45)])
+        self.assertNotContains(response, 'Показать еще комментарии')
+
+    def test_detail_page_accepts_cursor_without_javascript(self):
+        response, _ = self.detail(self.post)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]),
+            {'after': response.context['comments'].next_cursor}
+        )
+        self.assertEqual(self.texts(response)[0], 'Комментарий 20')
+
+    def test_partial_with_bad_cursor_is_empty(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    """Создаем автора и читателя."""
+    def setUp(self):
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.comments_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда rebuild_counters исправляет разошедшиеся счетчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(author=self.reader, post=post, text='Ок')
+            for _ in range(2)
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertEqual(self.stats(self.reader).comments_count, 2)
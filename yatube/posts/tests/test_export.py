@@ -0,0 +1,170 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    """Автор с постами в группе, комментариями и картинкой."""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='anna')
+        self.group = Group.objects.create(
+            title='Книги', slug='books', description='Про книги'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {i}'
+            )
+            for i in range(3)
+        ]
+        self.posts[0].image = SimpleUploadedFile('small.gif', SMALL_GIF)
+        self.posts[0].save()
+        Comment.objects.create(
+            author=self.reader, post=self.posts[1], text='Отлично'
+        )
+        Post.objects.create(author=self.reader, text='Чужой пост')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:profile_export', args=['leo'])
+
+    def test_ndjson_stream(self):
+        """NDJSON содержит пользователей, группу, посты и комментарии."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        kinds = [record.pop('kind') for record in records]
+        self.assertEqual(kinds, ['users'] * 2 + ['groups'] + ['posts'] * 3 + [
+            'comments'
+        ])
+        self.assertEqual(
+            [record['text'] for record in records[3:6]],
+            ['Пост 0', 'Пост 1', 'Пост 2']
+        )
+        self.assertEqual(records[6], {
+            'post': self.posts[1].pk, 'author': 'anna', 'text': 'Отлично',
+            'pub_date': Comment.objects.get().pub_date.isoformat(),
+        })
+
+    def test_zip_archive_can_be_imported(self):
+        """Архив содержит файлы для import_data и изображения."""
+        response = self.client.get(self.url, {'format': 'zip'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        image = self.posts[0].image.name
+        self.assertEqual(archive.namelist(), [
+            'users.ndjson', 'groups.ndjson', 'posts.ndjson',
+            'comments.ndjson', f'images/{image}',
+        ])
+        self.assertEqual(archive.read(f'images/{image}'), SMALL_GIF)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        archive.extractall(directory)
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command(
+            'import_data', stdout=StringIO(), stderr=StringIO(),
+            skip_rebuild=True, **{
+                kind: os.path.join(directory, f'{kind}.ndjson')
+                for kind in ('users', 'groups', 'posts', 'comments')
+            }
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Пост 0', 'Пост 1', 'Пост 2']
+        )
+        self.assertEqual(Comment.objects.get().post.text, 'Пост 1')
+        self.assertEqual(Post.objects.exclude(image='').get().image, image)
+
+    def test_ndjson_stream_can_be_imported(self):
+        """Поток NDJSON загружается import_data --stream без изменений."""
+        response = self.client.get(self.url)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'export.ndjson')
+        with open(path, 'wb') as target:
+            target.write(b''.join(response.streaming_content))
+            target.write(b'{"kind": "likes"}\n')
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        errors = StringIO()
+        call_command(
+            'import_data', stream=path, skip_rebuild=True,
+            stdout=StringIO(), stderr=errors
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text'
+            )),
+            [('leo', 'books', f'Пост {i}') for i in range(3)]
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(
+            (comment.author.username, comment.post.text, comment.text),
+            ('anna', 'Пост 1', 'Отлично')
+        )
+        self.assertIn(
+            'export.ndjson:8: неверный вид записи', errors.getvalue()
+        )
+
+    def test_access(self):
+        """Выгрузку автора получает он сам, выгрузку группы — сотрудник."""
+        group_url = reverse('posts:group_export', args=['books'])
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(reader.get(self.url).status_code, 403)
+        self.assertEqual(reader.get(group_url).status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.reader.is_staff = True
+        self.reader.save()
+        self.assertEqual(reader.get(group_url).status_code, 200)
+        self.assertEqual(Client().get(self.url).status_code, 302)
+
+    def test_command_writes_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'books.zip')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command(
+            'export_data', '--group=books', '--format=zip', f'--output={path}'
+        )
+        with zipfile.ZipFile(path) as archive:
+            posts = archive.read('posts.ndjson').decode().splitlines()
+        self.assertEqual(len(posts), 3)
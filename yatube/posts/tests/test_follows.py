@@ -0,0 +1,85 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from .. import follows
+from ..models import Follow, User, UserStats
+
+
+class FollowSetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не создает строк и не ломает транзакцию."""
+        author = self.authors[0]
+        with transaction.atomic():
+            self.assertTrue(follows.follow(self.reader, author))
+            self.assertFalse(follows.follow(self.reader, author))
+            self.assertEqual(Follow.objects.count(), 1)
+        self.assertFalse(follows.follow(self.reader, self.reader))
+        self.assertEqual(
+            UserStats.objects.get(user=author).followers_count, 1
+        )
+        self.assertTrue(follows.unfollow(self.reader, author))
+        self.assertFalse(follows.unfollow(self.reader, author))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_set_is_cached_and_reset_on_changes(self):
+        follows.follow(self.reader, self.authors[0])
+        self.assertTrue(follows.is_following(self.reader, self.authors[0]))
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follows.is_following(self.reader, self.authors[1])
+            )
+        follows.follow(self.reader, self.authors[1])
+        self.assertTrue(follows.is_following(self.reader, self.authors[1]))
+        follows.unfollow(self.reader, self.authors[0])
+        self.assertFalse(follows.is_following(self.reader, self.authors[0]))
+
+    def test_batch_lookups(self):
+        """Подписки нескольких пользователей читаются одним запросом."""
+        for author in self.authors[1:]:
+            follows.follow(self.reader, author)
+        follows.follow(self.authors[0], self.reader)
+        ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            sets = follows.followed([self.reader.pk, self.authors[0].pk])
+        self.assertEqual(sorted(sets[self.reader.pk]), ids[1:])
+        self.assertEqual(list(sets[self.authors[0].pk]), [self.reader.pk])
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follows.is_following(self.reader, self.authors[1])
+            )
+            self.assertFalse(
+                follows.is_following(self.reader, self.authors[0])
+            )
+
+    def test_batch_check_for_many_authors(self):
+        """Проверка списка авторов — одно чтение кэша или один запрос."""
+        ids = [author.pk for author in self.authors]
+        follows.follow(self.reader, self.authors[1])
+        with self.assertNumQueries(1):
+            self.assertEqual(follows.following(self.reader, ids), {ids[1]})
+        with self.assertNumQueries(0):
+            self.assertEqual(follows.following(self.reader, ids), {ids[1]})
+            self.assertTrue(follows.follows_any(self.reader, ids))
+            self.assertFalse(follows.follows_any(self.reader, ids[::2]))
+        follows.follow(self.reader, self.authors[2])
+        self.assertTrue(follows.follows_any(self.reader, ids[::2]))
+        self.assertEqual(
+            follows.following(self.reader, ids), set(ids[1:])
+        )
+        follows.unfollow(self.reader, self.authors[1])
+        follows.unfollow(self.reader, self.authors[2])
+        self.assertEqual(follows.following(self.reader, ids), set())
+        self.assertFalse(follows.follows_any(self.reader, ids))
+        self.assertFalse(follows.follows_any(AnonymousUser(), ids))
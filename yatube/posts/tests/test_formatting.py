@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import formatting
+from ..models import Comment, Post, User
+
+
+class RenderTextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='leo')
+
+    def test_text_is_escaped_and_split_into_paragraphs(self):
+        html = formatting.render_text('<b>жирный</b>\n\nвторой абзац')
+        self.assertEqual(
+            html,
+            '<p>&lt;b&gt;жирный&lt;/b&gt;</p>\n\n<p>второй абзац</p>'
+        )
+
+    def test_links_and_mentions_of_existing_users(self):
+        html = formatting.render_text(
+            'см. https://example.com/@leo и @leo, но не @ghost'
+        )
+        self.assertIn(
+            '<a href="https://example.com/@leo" rel="nofollow">', html
+        )
+        self.assertIn(
+            f'<a href="{reverse("posts:profile", args=["leo"])}">@leo</a>',
+            html
+        )
+        self.assertIn('@ghost', html)
+        self.assertNotIn('/profile/ghost/', html)
+
+    def test_html_is_rendered_on_save_and_edit(self):
+        post = Post.objects.create(author=self.user, text='первый')
+        self.assertEqual(post.text_html, '<p>первый</p>')
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'второй'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>второй</p>')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='@leo'
+        )
+        self.assertIn('>@leo</a>', comment.text_html)
+
+
+class BackfillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(author=cls.user, text='привет @leo')
+        Comment.objects.create(post=cls.post, author=cls.user, text='ответ')
+
+    def test_command_fills_empty_html_and_bumps_version(self):
+        Post.objects.update(text_html='')
+        Comment.objects.update(text_html='')
+        version = Post.objects.get(pk=self.post.pk).version
+        out = StringIO()
+        call_command('render_text_html', batch_size=1, stdout=out)
+        self.assertIn('постов 1, комментариев 1', out.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIn('>@leo</a>', post.text_html)
+        self.assertEqual(post.version, version + 1)
+        self.assertEqual(
+            Comment.objects.get().text_html, '<p>ответ</p>'
+        )
+        call_command('render_text_html', stdout=out)
+        self.assertIn('постов 0, комментариев 0', out.getvalue())
+
+    def test_pages_fall_back_to_plain_text(self):
+        Post.objects.update(text_html='')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, '<p>привет @leo</p>')
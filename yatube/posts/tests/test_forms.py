@@ -3,6 +3,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from ..models import Post, Group, Comment
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+import hashlib
 import shutil
 import tempfile
 from django.conf import settings
@@ -77,7 +78,9 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, PostFormTests.user)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(
+            post.image, f'posts/{hashlib.sha256(small_gif).hexdigest()}.gif'
+        )
 
     def test_edit_post(self):
         """Валидная форма редактирует запись в Post."""
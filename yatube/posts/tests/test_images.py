@@ -0,0 +1,157 @@
+import hashlib
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size, fmt='JPEG', mode='RGB', **options):
+    output = io.BytesIO()
+    Image.new(mode, size, 'red').save(output, fmt, **options)
+    return output.getvalue()
+
+
+def upload(content, name='photo.jpg'):
+    return SimpleUploadedFile(name, content, content_type='image/jpeg')
+
+
+def exif(orientation=None):
+    data = Image.Exif()
+    data[0x010F] = 'Camera'
+    if orientation:
+        data[images.ORIENTATION] = orientation
+    return data.tobytes()
+
+
+@override_settings(IMAGE_MAX_SIZE=100, IMAGE_MAX_PIXELS=1_000_000)
+class NormalizeTests(TestCase):
+    """Обрабатываем загрузки без формы."""
+    def test_small_clean_image_kept(self):
+        """Небольшое изображение без метаданных не перекодируется."""
+        content = image_bytes((50, 40))
+        source = upload(content)
+        result = images.normalize(source)
+        self.assertIs(result, source)
+        self.assertEqual(result.read(), content)
+
+    def test_large_image_downscaled(self):
+        """Изображение больше IMAGE_MAX_SIZE уменьшается с пропорциями."""
+        result = images.normalize(upload(image_bytes((400, 200))))
+        image = Image.open(result)
+        self.assertEqual((image.format, image.size), ('JPEG', (100, 50)))
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_exif_stripped_and_applied(self):
+        """EXIF удаляется, а поворот из него применяется к пикселям."""
+        result = images.normalize(upload(
+            image_bytes((60, 30), exif=exif(orientation=6))
+        ))
+        image = Image.open(result)
+        self.assertEqual(image.size, (30, 60))
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_animation_reduced_to_first_frame(self):
+        """От анимированного GIF остается первый кадр в JPEG."""
+        frames = [Image.new('RGB', (20, 20), color) for color in (
+            'red', 'blue'
+        )]
+        output = io.BytesIO()
+        frames[0].save(
+            output, 'GIF', save_all=True, append_images=frames[1:]
+        )
+        result = images.normalize(upload(output.getvalue(), 'anim.gif'))
+        image = Image.open(result)
+        self.assertEqual((result.name, image.format), ('anim.jpg', 'JPEG'))
+        self.assertFalse(getattr(image, 'is_animated', False))
+        red, green, blue = image.getpixel((10, 10))
+        self.assertGreater(red, 200)
+        self.assertLess(blue, 50)
+
+    def test_transparency_kept_in_png(self):
+        """Изображение с прозрачностью перекодируется в PNG."""
+        result = images.normalize(upload(
+            image_bytes((300, 300), 'PNG', 'RGBA'), 'logo.png'
+        ))
+        image = Image.open(result)
+        self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+        self.assertEqual(image.size, (100, 100))
+
+    def test_decompression_bomb_rejected_before_decode(self):
+        """Изображение больше IMAGE_MAX_PIXELS отклоняется по заголовку."""
+        # PNG 2000x2000 без сжатых данных: декодировать нечего.
+        content = image_bytes((2000, 2000), 'PNG')
+        content = content[:content.index(b'IDAT') + 4]
+        with self.assertRaises(ValidationError) as error:
+            images.normalize(upload(content, 'bomb.png'))
+        self.assertEqual(error.exception.code, 'image_too_large')
+
+    def test_not_an_image_rejected(self):
+        with self.assertRaises(ValidationError) as error:
+            images.normalize(upload(b'not an image', 'text.jpg'))
+        self.assertEqual(error.exception.code, 'invalid_image')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIZE=100)
+class PostImageUploadTests(TestCase):
+    """Публикуем пост с картинкой через форму."""
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем тестовые медиа."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='leo')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_uploaded_image_normalized(self):
+        """В хранилище попадает уменьшенная копия без EXIF."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Фото',
+            'image': upload(image_bytes((400, 400), exif=exif())),
+        })
+        post = Post.objects.get(text='Фото')
+        with post.image.open('rb') as stored:
+            content = stored.read()
+        self.assertEqual(
+            post.image.name,
+            f'posts/{hashlib.sha256(content).hexdigest()}.jpg'
+        )
+        image = Image.open(io.BytesIO(content))
+        self.assertEqual(image.size, (100, 100))
+        self.assertNotIn('exif', image.info)
+
+    @override_settings(IMAGE_MAX_PIXELS=10_000)
+    def test_bomb_is_form_error(self):
+        form = PostForm(
+            data={'text': 'Бомба'},
+            files={'image': upload(image_bytes((200, 200)))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_unchanged_image_not_processed(self):
+        """Правка поста без новой загрузки не трогает изображение."""
+        post = Post.objects.create(
+            author=self.user, text='Старый', image='posts/old.jpg'
+        )
+        form = PostForm(data={'text': 'Новый'}, instance=post)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['image'], 'posts/old.jpg')
@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import search
+from ..importing import Importer
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats
+)
+
+
+class ImportDataTests(TestCase):
+    """Готовим файлы выгрузки в NDJSON и CSV."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        User.objects.create_user(username='existing')
+        self.files = {
+            'users': self.ndjson('users.ndjson', [
+                {'username': 'leo', 'first_name': 'Лев'},
+                {'username': 'anna'},
+                {'username': 'leo'},
+                {'username': 'bad name!'},
+            ]),
+            'groups': self.csv('groups.csv', [
+                'slug,title,description',
+                'books,Книги,Про книги',
+            ]),
+            'posts': self.ndjson('posts.ndjson', [
+                {'id': 'p1', 'author': 'leo', 'group': 'books',
+                 'text': 'Война и мир', 'pub_date': '2020-01-02T03:04:05'},
+                {'id': 'p2', 'author': 'existing', 'text': 'Анна Каренина'},
+                {'id': 'p3', 'author': 'ghost', 'text': 'Без автора'},
+                {'id': 'p4', 'author': 'leo', 'text': 'Дата',
+                 'pub_date': 'вчера'},
+            ]),
+            'comments': self.csv('comments.csv', [
+                'post,author,text,pub_date',
+                'p1,anna,Отлично,2020-01-03T00:00:00',
+                'p3,anna,Нет поста,',
+            ]),
+            'follows': self.ndjson('follows.jsonl', [
+                {'user': 'anna', 'author': 'leo'},
+                {'user': 'anna', 'author': 'leo'},
+                {'user': 'leo', 'author': 'leo'},
+            ]),
+        }
+
+    def ndjson(self, name, records):
+        return self.write(name, [json.dumps(record) for record in records])
+
+    def csv(self, name, lines):
+        return self.write(name, lines)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('\n'.join(lines) + '\n')
+        return path
+
+    def run_import(self, **options):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_data', chunk_size=2, stdout=out, stderr=err,
+            **self.files, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        """Верные строки загружаются, неверные попадают в отчет."""
+        out, err = self.run_import()
+        self.assertIn('Пользователи: принято 2, отклонено 2', out)
+        self.assertIn('Посты: принято 2, отклонено 2', out)
+        # Повторная подписка отбрасывается уникальным ограничением.
+        self.assertIn('Подписки: принято 2, отклонено 1', out)
+        self.assertIn('users.ndjson:3: Пользователь leo уже есть.', err)
+        self.assertIn('posts.ndjson:3: Нет пользователя ghost.', err)
+        leo = User.objects.get(username='leo')
+        self.assertFalse(leo.has_usable_password())
+        post = Post.objects.get(text='Война и мир')
+        self.assertEqual(post.author, leo)
+        self.assertEqual(post.group, Group.objects.get(slug='books'))
+        self.assertEqual(
+            post.pub_date.isoformat(), '2020-01-02T03:04:05+00:00'
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(
+            comment.pub_date.isoformat(), '2020-01-03T00:00:00+00:00'
+        )
+        self.assertEqual(Follow.objects.get().author, leo)
+        # auto_now_add отключается только на время вставки.
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_rebuilds_derived_data(self):
+        """После загрузки пересобраны счетчики, ленты и поиск."""
+        self.run_import()
+        leo = User.objects.get(username='leo')
+        self.assertEqual(leo.stats.posts_count, 1)
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertEqual(Post.objects.get(author=leo).comments_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='anna', author=leo
+        ).exists())
+        self.assertEqual(len(search.SearchResults('война')), 1)
+        # Новые строки без явного pk не конфликтуют с загруженными.
+        self.assertTrue(Post.objects.create(author=leo, text='Новый').pk)
+
+    def test_rebuild_limited_to_imported_rows(self):
+        """Пересобираются только загруженные строки и их пользователи."""
+        other = User.objects.create_user(username='other')
+        old = Post.objects.create(author=other, text='Старый пост')
+        Post.objects.filter(pk=old.pk).update(
+            comments_count=5, text_html=''
+        )
+        UserStats.objects.filter(user=other).update(posts_count=7)
+        self.run_import()
+        old.refresh_from_db()
+        self.assertEqual((old.comments_count, old.text_html), (5, ''))
+        self.assertEqual(UserStats.objects.get(user=other).posts_count, 7)
+        self.assertEqual(len(search.SearchResults('старый')), 1)
+        self.assertEqual(
+            User.objects.get(username='existing').stats.posts_count, 1
+        )
+
+    def test_rows_written_once(self):
+        """Даты вставляются сразу, без второго прохода UPDATE."""
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(skip_rebuild=True)
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ])
+
+    def test_imported_rows_exclude_concurrent_ones(self):
+        """Посты, созданные во время импорта, не считаются загруженными."""
+        importer = Importer()
+        importer.load('users', [(1, {'username': 'leo'})])
+        importer.load('posts', [
+            (1, {'author': 'leo', 'text': 'Первый'}),
+            (2, {'author': 'ghost', 'text': 'Без автора'}),
+            (3, {'author': 'leo', 'text': 'Второй'}),
+        ])
+        leo = User.objects.get(username='leo')
+        Post.objects.create(author=leo, text='Во время импорта')
+        self.assertQuerysetEqual(
+            importer.imported(Post).order_by('pk'),
+            ['Первый', 'Второй'], transform=lambda post: post.text
+        )
+        self.assertQuerysetEqual(
+            importer.imported(User), [leo.pk], transform=lambda user: user.pk
+        )
+
+    def test_strict_mode_stops_on_first_error(self):
+        with self.assertRaisesMessage(CommandError, 'users:3'):
+            self.run_import(strict=True)
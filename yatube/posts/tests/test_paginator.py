@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import db
+from core.paginators import CursorPaginator, WindowPaginator, table_rows
+from ..models import Post
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    """Создаем 25 постов с одинаковой датой публикации."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(25)
+        )
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def ids(self, page):
+        return [post.pk for post in page]
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Переходы по курсору дают те же страницы, что и по номеру."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page(1)
+        second = paginator.get_page(after=first.next_cursor)
+        third = paginator.get_page(after=second.next_cursor)
+        self.assertEqual(self.ids(second), self.ids(paginator.page(2)))
+        self.assertEqual(self.ids(third), self.ids(paginator.page(3)))
+        self.assertEqual(third.number, 3)
+        self.assertIsNone(third.next_cursor)
+        back = paginator.get_page(before=third.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(second))
+        self.assertEqual(back.number, 2)
+
+    def test_no_count_mode_skips_count_query(self):
+        """Без подсчета пагинатор не выполняет COUNT(*)."""
+        paginator = CursorPaginator(Post.objects.all(), 10, count=False)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(2)
+            self.assertTrue(page.has_next())
+            self.assertTrue(page.has_previous())
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        last = paginator.get_page(after=page.next_cursor)
+        self.assertEqual(len(last), 5)
+        self.assertFalse(last.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Поврежденный курсор открывает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(after='not-a-cursor')
+        self.assertEqual(page.number, 1)
+        self.assertEqual(self.ids(page), self.ids(paginator.page(1)))
+
+    def test_estimate_replaces_count(self):
+        """С оценкой пагинатор не считает строки и не доверяет ей вслепую."""
+        paginator = CursorPaginator(Post.objects.all(), 10, estimate=1000)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(2)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(paginator.num_pages, 100)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.page_window, [1, 2, 3, 4, 5, '…', 100])
+        last = paginator.get_page(100)
+        self.assertEqual(last.number, 3)
+        self.assertEqual(len(last), 5)
+        self.assertEqual(paginator.count, 25)
+
+    def test_high_estimate_ends_at_last_row(self):
+        """Завышенная оценка не дает ссылок за последнюю страницу."""
+        five = Post.objects.filter(
+            pk__in=Post.objects.values('pk')[:5]
+        )
+        paginator = CursorPaginator(five, 10, estimate=1000)
+        page = paginator.get_page(1)
+        self.assertIsNone(page.next_cursor)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.num_pages, 1)
+        self.assertEqual(page.page_window, [1])
+        paginator = CursorPaginator(Post.objects.all(), 10, estimate=1000)
+        second = paginator.get_page(after=paginator.get_page(1).next_cursor)
+        last = paginator.get_page(after=second.next_cursor)
+        self.assertFalse(last.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(last.page_window, [1, 2, 3])
+
+    def test_low_estimate_does_not_hide_pages(self):
+        paginator = CursorPaginator(Post.objects.all(), 10, estimate=5)
+        page = paginator.get_page(2)
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.page_window, [1, 2, 3])
+
+    def test_table_rows_come_from_statistics(self):
+        self.assertIsNone(table_rows(Post))
+        db.analyze()
+        self.assertEqual(table_rows(Post), 25)
+
+
+class WindowPaginatorTests(TestCase):
+    def window(self, number, pages=100):
+        paginator = WindowPaginator(range(pages), 1)
+        return paginator.page(number).page_window
+
+    def test_window_around_current_page(self):
+        self.assertEqual(self.window(1), [1, 2, 3, 4, '…', 100])
+        self.assertEqual(
+            self.window(50), [1, '…', 47, 48, 49, 50, 51, 52, 53, '…', 100]
+        )
+        self.assertEqual(self.window(99), [1, '…', 96, 97, 98, 99, 100])
+        self.assertEqual(self.window(3, pages=8), list(range(1, 9)))
+
+
+class FeedPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='leo')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {i}') for i in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_renders_page_window(self):
+        """Ссылок на страницы не больше окна, как бы их ни было много."""
+        with self.settings(POSTS_PER_PAGE=1):
+            response = self.client.get(
+                reverse('posts:index'), {'page': 30}
+            )
+        page = response.context['page_obj']
+        self.assertEqual(
+            page.page_window,
+            [1, '…', 27, 28, 29, 30, 31, 32, 33, '…', 60]
+        )
+        self.assertContains(response, 'page-item', count=15)
+        self.assertContains(response, '?page=60')
+
+    def test_feed_over_estimate_has_no_dead_links(self):
+        """По завышенной оценке шаблон не ссылается на пустые страницы."""
+        cache.set('feed-count:global', 1000)
+        with self.settings(POSTS_PER_PAGE=100):
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertNotContains(response, 'Следующая')
+        self.assertNotContains(response, 'Последняя')
@@ -0,0 +1,52 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from ..management.commands.check_query_plans import explain, page_queries
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    def test_views_do_not_scan_tables(self):
+        """Запросы страниц идут по индексам."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Полных чтений таблиц нет.', out.getvalue())
+
+    def test_next_page_seeks_index(self):
+        """Следующая страница ленты начинается с ключа, а не с начала."""
+        plans = [
+            line for sql in page_queries()['index: следующая страница']
+            for line in explain(sql)
+        ]
+        self.assertIn(
+            'SEARCH posts_post USING INDEX post_date_idx (pub_date<?)', plans
+        )
+
+    def test_pages_requested_on_rolled_back_data(self):
+        """Проверяется SQL самих представлений; данные не остаются в БД."""
+        pages = page_queries()
+        self.assertEqual(set(pages), {
+            'index', 'index: следующая страница',
+            'group_list', 'group_list: следующая страница',
+            'profile', 'profile: следующая страница',
+            'post_detail', 'post_comments',
+            'follow_index', 'follow_index: следующая страница',
+            'search',
+        })
+        self.assertTrue(all(pages.values()))
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на автора не создает вторую запись."""
+        user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='leo')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=user, author=author)
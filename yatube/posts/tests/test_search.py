@@ -0,0 +1,126 @@
+import importlib
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Создаем посты с повторяющимися словами."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo')
+        self.often = Post.objects.create(
+            author=self.user, text='Война, война и снова война'
+        )
+        self.once = Post.objects.create(
+            author=self.user, text='Война и мир — длинный роман'
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Анна Каренина'
+        )
+        self.url = reverse('posts:search')
+
+    def found(self, query):
+        response = self.client.get(self.url, {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_uses_fts_on_sqlite(self):
+        """На SQLite с FTS5 поиск идет по виртуальной таблице."""
+        self.assertIsInstance(search.get_index(), search.FtsIndex)
+
+    def test_inflected_forms_match(self):
+        """Поиск находит другие формы слова и не зависит от ё."""
+        self.assertEqual(self.found('войною'), [self.often.pk, self.once.pk])
+        self.assertEqual(self.found('Карениной'), [self.other.pk])
+        self.often.text = 'Ёжики в тумане'
+        self.often.save()
+        self.assertEqual(self.found('ежик'), [self.often.pk])
+
+    def test_results_are_ranked(self):
+        """Чем чаще слово в посте, тем выше пост в выдаче."""
+        self.assertEqual(self.found('ВОЙНА'), [self.often.pk, self.once.pk])
+        self.assertEqual(self.found('война мир'), [self.once.pk])
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу отражаются в выдаче."""
+        self.other.text = 'Война в Крыму'
+        self.other.save()
+        self.assertIn(self.other.pk, self.found('война'))
+        self.assertEqual(self.found('каренина'), [])
+        self.often.delete()
+        self.assertNotIn(self.often.pk, self.found('война'))
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_pagination_keeps_query(self):
+        """Ссылки на страницы сохраняют поисковый запрос."""
+        response = self.client.get(self.url, {'q': 'война'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(
+            response, '?q=%D0%B2%D0%BE%D0%B9%D0%BD%D0%B0&amp;page=2'
+        )
+
+    def test_term_index_matches_fts(self):
+        """Индекс на таблице PostTerm дает ту же выдачу, что и FTS5."""
+        index = search.TermIndex()
+        search.fill(index, Post.objects.all())
+        fts = search.get_index()
+        for query in ('война', 'война мир', 'каренина', 'толстой'):
+            with self.subTest(query=query):
+                terms = search.analyze(query)
+                self.assertEqual(
+                    [pk for pk, _ in index.search(terms, 10)],
+                    [pk for pk, _ in fts.search(terms, 10)]
+                )
+                self.assertEqual(index.count(terms), fts.count(terms))
+
+    def test_term_index_ranks_in_sql(self):
+        """Страница выдачи PostTerm — один запрос плюс частоты терминов."""
+        index = search.TermIndex()
+        search.fill(index, Post.objects.all())
+        terms = search.analyze('война')
+        index.search(terms, 10)
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                [pk for pk, _ in index.search(terms, 1, offset=1)],
+                [self.once.pk]
+            )
+
+    def test_reindex_migration_uses_frozen_analyzer(self):
+        """Миграция 0020 заполняет индекс своей копией анализатора."""
+        migration = importlib.import_module(
+            'posts.migrations.0020_reanalyze_search_index'
+        )
+        for post in Post.objects.all():
+            self.assertEqual(
+                migration.analyze(post.text), search.analyze(post.text)
+            )
+        search.get_index().clear()
+        self.assertEqual(self.found('войною'), [])
+        migration.reindex(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.found('войною'), [self.often.pk, self.once.pk])
+
+    def test_admin_search_uses_ranked_index(self):
+        """Поиск в админке упорядочен по релевантности."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'война'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.often.pk, self.once.pk]
+        )
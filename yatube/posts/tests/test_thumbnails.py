@@ -0,0 +1,184 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+PLACEHOLDER = '/static/img/placeholder.svg'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    """Публикуем пост с картинкой через форму."""
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем тестовые медиа."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(self.cache_dir(), ignore_errors=True)
+        self.user = User.objects.create_user(username='leo')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def publish(self, text='Пост с картинкой', content=SMALL_GIF):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': text,
+            'image': SimpleUploadedFile(
+                name='small.gif', content=content, content_type='image/gif'
+            ),
+        })
+        return Post.objects.get(text=text)
+
+    def cache_dir(self):
+        return os.path.join(TEMP_MEDIA_ROOT, 'cache')
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_placeholder_until_rendition_is_ready(self):
+        """Пока миниатюра в очереди, страница показывает заглушку."""
+        post = self.publish()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), PLACEHOLDER)
+        # Запрос страницы не создает миниатюр сам.
+        self.assertFalse(os.path.exists(self.cache_dir()))
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_rendition_generated_on_save(self):
+        """Сохранение формы создает миниатюру, и шаблон ее находит."""
+        self.publish()
+        self.assertTrue(os.listdir(self.cache_dir()))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_page_looks_up_renditions_at_once(self):
+        """Карточки страницы ищут миниатюры одним запросом."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}', image=f'posts/{i}.gif')
+            for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, PLACEHOLDER, count=5)
+        lookups = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_command_warms_and_collects_orphans(self):
+        """Команда создает недостающие миниатюры и удаляет лишние."""
+        post = self.publish()
+        orphan = self.publish('Удаленный пост', OTHER_GIF)
+        call_command(
+            'thumbnails', workers=0, skip_gc=True, stdout=StringIO()
+        )
+        files = [
+            name for _, _, names in os.walk(self.cache_dir())
+            for name in names
+        ]
+        self.assertEqual(len(files), 2)
+        # Замена без сигналов: прежняя картинка осталась сиротой.
+        Post.objects.filter(pk=orphan.pk).update(image='')
+        output = StringIO()
+        call_command('thumbnails', workers=0, stdout=output)
+        remaining = [
+            name for _, _, names in os.walk(self.cache_dir())
+            for name in names
+        ]
+        self.assertEqual(len(remaining), 1)
+        self.assertIn('удалено файлов 1', output.getvalue())
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertNotContains(response, PLACEHOLDER)
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_command_since_warms_only_new_posts(self):
+        """С --since миниатюры создаются только для новых постов."""
+        self.publish()
+        new = self.publish('Новый пост', OTHER_GIF)
+        with self.assertRaises(CommandError):
+            call_command('thumbnails', since=new.pk, stdout=StringIO())
+        call_command(
+            'thumbnails', workers=0, since=new.pk, skip_gc=True,
+            stdout=StringIO()
+        )
+        files = [
+            name for _, _, names in os.walk(self.cache_dir())
+            for name in names
+        ]
+        self.assertEqual(len(files), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class DeduplicatedImagesTests(TestCase):
+    """Автор дважды загружает одну и ту же картинку."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leo')
+        self.client = Client()
+        self.client.force_login(self.user)
+        for text in ('Первый пост', 'Второй пост'):
+            self.client.post(reverse('posts:post_create'), data={
+                'text': text,
+                'image': SimpleUploadedFile(
+                    name=f'{text}.gif', content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            })
+        self.first, self.second = Post.objects.order_by('pk')
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковое содержимое хранится одним файлом по дайджесту."""
+        self.assertEqual(self.first.image.name, self.second.image.name)
+        self.assertEqual(
+            os.path.basename(self.first.image.name),
+            hashlib.sha256(SMALL_GIF).hexdigest() + '.gif'
+        )
+        with self.first.image.open() as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+
+    def test_file_released_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом."""
+        name = self.first.image.name
+        path = self.first.image.path
+        self.first.delete()
+        thumbnails.release(name)
+        self.assertTrue(os.path.exists(path))
+        self.second.delete()
+        thumbnails.release(name)
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,175 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    """Создаем автора с постами и подписчика."""
+    def setUp(self):
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='reader')
+        self.old_post = Post.objects.create(author=self.author, text='Старый')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def timeline(self):
+        return list(
+            TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента заполняется при подписке и публикации, чистится при
+        отписке и удалении поста.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline(), [self.old_post.pk])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertCountEqual(self.timeline(), [self.old_post.pk, new_post.pk])
+        new_post.delete()
+        self.assertEqual(self.timeline(), [self.old_post.pk])
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.timeline(), [])
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_follow_index_reads_timeline_pages(self):
+        """Лента подписок листается курсором в порядке публикации."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(4):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        expected = list(
+            self.author.posts.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        url = reverse('posts:follow_index')
+        seen = []
+        page = self.client.get(url).context['page_obj']
+        while True:
+            seen += [post.pk for post in page]
+            if not page.has_next():
+                break
+            page = self.client.get(
+                url, {'after': page.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(seen, expected)
+
+    @override_settings(POSTS_PER_PAGE=2, TIMELINE_PULL_THRESHOLD=2)
+    def test_hybrid_timeline_merges_pulled_authors(self):
+        """Посты популярных авторов не рассылаются, но попадают в ленту."""
+        star = User.objects.create_user(username='star')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=star)
+        Follow.objects.create(user=self.reader, author=star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([star, self.author] * 3)
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=star).exists()
+        )
+        url = reverse('posts:follow_index')
+        seen = []
+        page = self.client.get(url).context['page_obj']
+        while True:
+            seen += [post.pk for post in page]
+            if not page.has_next():
+                break
+            page = self.client.get(
+                url, {'after': page.next_cursor}
+            ).context['page_obj']
+        expected = sorted(
+            [post.pk for post in posts] + [self.old_post.pk], reverse=True
+        )
+        self.assertEqual(seen, expected)
+        back = self.client.get(
+            url, {'before': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in back], expected[4:6])
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=2, TIMELINE_PULL_MARGIN=1)
+    def test_crossing_pull_threshold_keeps_posts(self):
+        """Посты автора остаются в ленте, когда он пересекает порог
+        рассылки в обе стороны.
+        """
+        fan = User.objects.create_user(username='fan')
+        url = reverse('posts:follow_index')
+
+        def feed():
+            page = self.client.get(url).context['page_obj']
+            return [post.pk for post in page]
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        pushed = Post.objects.create(author=self.author, text='До порога')
+        Follow.objects.create(user=fan, author=self.author)
+        pulled = Post.objects.create(author=self.author, text='Над порогом')
+        self.assertNotIn(pulled.pk, self.timeline())
+        expected = [pulled.pk, pushed.pk, self.old_post.pk]
+        self.assertEqual(feed(), expected)
+        Follow.objects.filter(user=fan).delete()
+        self.assertCountEqual(self.timeline(), expected)
+        self.assertEqual(feed(), expected)
+        Post.objects.create(author=self.author, text='После порога')
+        self.assertEqual(len(feed()), 4)
+
+    def follow_from(self, *names):
+        users = [User.objects.create_user(username=name) for name in names]
+        for user in users:
+            Follow.objects.create(user=user, author=self.author)
+        return users
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=3, TIMELINE_PULL_MARGIN=2)
+    def test_pull_hysteresis_band(self):
+        """Автор в полосе между порогами не переключается туда и обратно."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        first, second = self.follow_from('first', 'second')
+        self.assertTrue(timeline.is_pulled(self.author.pk))
+        pulled = Post.objects.create(author=self.author, text='Над порогом')
+        second_follow = Follow.objects.get(user=second)
+        second_follow.delete()
+        # Два подписчика: в полосе, посты по-прежнему читаются лентой.
+        self.assertTrue(timeline.is_pulled(self.author.pk))
+        self.assertNotIn(pulled.pk, self.timeline())
+        Follow.objects.create(user=second, author=self.author)
+        Follow.objects.filter(user__in=[first, second]).delete()
+        self.assertFalse(timeline.is_pulled(self.author.pk))
+        self.assertCountEqual(
+            self.timeline(), [self.old_post.pk, pulled.pk]
+        )
+
+    @override_settings(
+        TIMELINE_PULL_THRESHOLD=2, TIMELINE_PULL_MARGIN=1,
+        TIMELINE_ASYNC=True, TIMELINE_BATCH_SIZE=1
+    )
+    def test_restore_runs_outside_unfollow_request(self):
+        """Отписка, опустившая автора под порог, не рассылает его посты.
+
+        Число запросов отписки не зависит от числа постов и подписчиков:
+        посты рассылает фоновая задача порциями.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        fan, = self.follow_from('fan')
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        client = Client()
+        client.force_login(fan)
+        url = reverse('posts:profile_unfollow', args=['leo'])
+        with self.assertNumQueries(12):
+            client.get(url)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual((stats.followers_count, stats.pulled), (1, True))
+        self.assertEqual(self.timeline(), [self.old_post.pk])
+        timeline.restore(self.author.pk)
+        self.assertFalse(timeline.is_pulled(self.author.pk))
+        self.assertCountEqual(
+            self.timeline(), [self.old_post.pk] + [post.pk for post in posts]
+        )
@@ -4,10 +4,14 @@ from ..models import Post, Group, Comment, Follow
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django import forms
+import hashlib
 import shutil
 import tempfile
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.testing import reset
 
 User = get_user_model()
 
@@ -45,6 +49,9 @@ class PostViewTests(TestCase):
             group=cls.group,
             image=uploaded
         )
+        cls.image_name = (
+            f'posts/{hashlib.sha256(small_gif).hexdigest()}.gif'
+        )
         cls.comment_post = Comment.objects.create(
             author=cls.user,
             text='А мне только битвы запомнились»',
@@ -75,7 +82,7 @@ class PostViewTests(TestCase):
         task_group = post.group
         self.assertEqual(
             task_image,
-            'posts/small.gif'
+            PostViewTests.image_name
         )
         self.assertEqual(
             task_author,
@@ -288,3 +295,65 @@ class PostViewTests(TestCase):
         )
         context_unfollow = response_unfollow.context
         self.assertEqual(len(context_unfollow['page_obj']), 0)
+
+
+class FeedQueriesTests(TestCase):
+    """Создаем посты разных авторов в группе и комментарии к посту."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа поклонников графа',
+            slug='tolstoi',
+            description='Что-то о группе'
+        )
+        cls.follower = User.objects.create_user(username='reader')
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f'author{i}', first_name='Лев', last_name=str(i)
+            )
+            Follow.objects.create(user=cls.follower, author=author)
+            cls.post = Post.objects.create(
+                author=author, text=f'Пост {i}', group=cls.group
+            )
+        for i in range(10):
+            Post.objects.create(author=author, text=f'Еще пост {i}')
+            Comment.objects.create(
+                author=User.objects.get(username=f'author{i}'),
+                post=cls.post,
+                text='Отличный пост'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(FeedQueriesTests.follower)
+        cache.clear()
+
+    def count_queries(self, url, per_page):
+        # Оба запроса с пустым кэшем: число постов ленты и пользователи
+        # тоже кэшируются.
+        cache.clear()
+        reset()
+        with self.settings(POSTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+        return len(queries)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        """Число запросов к БД не растет с числом постов на странице."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'tolstoi'}),
+            reverse('posts:profile', kwargs={'username': 'author9'}),
+            reverse('posts:follow_index'),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': FeedQueriesTests.post.pk}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 10)
+                )
@@ -0,0 +1,281 @@
+"""Заранее подготовленные миниатюры изображений постов.
+
+Миниатюры (renditions) из THUMBNAIL_RENDITIONS создаются фоновым пулом
+потоков сразу после сохранения изображения, а шаблоны только ищут
+готовую миниатюру в хранилище ключей sorl и до ее появления показывают
+заглушку. Поток запроса никогда не открывает и не декодирует оригинал.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Общий пул фоновых потоков; очередью служит очередь пула."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def _options(source, options):
+    """Опции миниатюры в том виде, в каком их дополняет бэкенд sorl.
+
+    Имя файла миниатюры зависит от полного набора опций, поэтому поиск
+    должен дополнять их так же, как ThumbnailBackend.get_thumbnail.
+    """
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, rendition):
+    """Файл миниатюры; имя вычисляется без обращения к хранилищу."""
+    geometry, options = settings.THUMBNAIL_RENDITIONS[rendition]
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options)
+    )
+    return ImageFile(name, default.storage)
+
+
+def _stored_many(image_files):
+    """Записи хранилища ключей sorl без запоминания промахов.
+
+    KVStore sorl на основе кэша и БД кэширует отсутствие записи
+    на THUMBNAIL_CACHE_TIMEOUT, и миниатюра, созданная в другом
+    процессе, осталась бы невидимой. Поэтому промахи перепроверяются
+    в БД при следующем поиске, все сразу одним запросом.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return [kvstore.get(image_file) for image_file in image_files]
+    keys = [add_prefix(image_file.key) for image_file in image_files]
+    values = {
+        key: value for key, value in kvstore.cache.get_many(keys).items()
+        if value is not None and value != cached_db_kvstore.EMPTY_VALUE
+    }
+    missing = set(keys) - set(values)
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).exclude(value='').values_list('key', 'value'))
+        kvstore.cache.set_many(
+            found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(found)
+    return [
+        deserialize_image_file(values[key]) if key in values else None
+        for key in keys
+    ]
+
+
+def _stored(image_file):
+    return _stored_many([image_file])[0]
+
+
+def prefetch(images):
+    """Ищет миниатюры всех изображений сразу и запоминает их в файлах.
+
+    Для страницы карточек это один запрос вместо запроса на каждое
+    изображение; lookup затем берет результат из image.renditions.
+    """
+    images = [image for image in images if image]
+    for rendition in settings.THUMBNAIL_RENDITIONS:
+        thumbnails = _stored_many(
+            [thumbnail_file(image, rendition) for image in images]
+        )
+        for image, thumbnail in zip(images, thumbnails):
+            if not hasattr(image, 'renditions'):
+                image.renditions = {}
+            image.renditions[rendition] = thumbnail
+
+
+def lookup(image, rendition):
+    """Готовая миниатюра изображения или None.
+
+    Выполняет только поиск в хранилище ключей и никогда не читает
+    оригинал.
+    """
+    if not image:
+        return None
+    renditions = getattr(image, 'renditions', {})
+    if rendition in renditions:
+        return renditions[rendition]
+    return _stored(thumbnail_file(image, rendition))
+
+
+def _source(name):
+    """Оригинал с хранилищем поля Post.image.
+
+    От хранилища зависят ключи sorl и, значит, имена миниатюр.
+    """
+    return Post(image=name).image
+
+
+def generate(name):
+    """Создает все миниатюры изображения, уже готовые пропускает."""
+    for geometry, options in settings.THUMBNAIL_RENDITIONS.values():
+        get_thumbnail(_source(name), geometry, **options)
+
+
+def render(name):
+    """Создает миниатюры изображения и обновляет его карточки."""
+    generate(name)
+    posts = Post.objects.filter(image=name)
+    # Карточки и страницы с заглушкой больше не нужны.
+    cache.bump_versions(posts)
+    for author_id, group_id in posts.values_list('author_id', 'group_id'):
+        cache.bump_post_pages(author_id, group_id)
+
+
+def release(name):
+    """Удаляет изображение и его миниатюры, если на него не ссылаются посты.
+
+    Одинаковые загрузки хранятся одним файлом (см.
+    core.storage.ContentAddressedStorage), поэтому число ссылок на файл —
+    это число постов с его именем.
+    """
+    if Post.objects.filter(image=name).exists():
+        return
+    try:
+        delete(_source(name))
+    except SuspiciousFileOperation:
+        # Имя задано в обход формы и указывает за пределы MEDIA_ROOT.
+        pass
+
+
+def _render_in_background(name):
+    try:
+        render(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        connections.close_all()
+
+
+def schedule(name):
+    """Ставит создание миниатюр в очередь после фиксации транзакции.
+
+    При THUMBNAIL_ASYNC = False миниатюры создаются сразу в текущем
+    потоке (удобно для тестов и команд).
+    """
+    if not settings.THUMBNAIL_ASYNC:
+        render(name)
+        return
+    transaction.on_commit(
+        lambda: executor().submit(_render_in_background, name)
+    )
+
+
+def warm(name):
+    """Задача пула процессов: имя изображения и текст ошибки или None."""
+    try:
+        generate(name)
+    except Exception as error:
+        return name, str(error) or error.__class__.__name__
+    return name, None
+
+
+def _walk(storage, path):
+    directories, files = storage.listdir(path)
+    for file_name in files:
+        yield f'{path}/{file_name}' if path else file_name
+    for directory in directories:
+        yield from _walk(storage, f'{path}/{directory}' if path else directory)
+
+
+def _collect_files(expected, dry_run):
+    storage = default.storage
+    prefix = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+    files = size = 0
+    if not storage.exists(prefix):
+        return files, size
+    for name in _walk(storage, prefix):
+        if name in expected:
+            continue
+        files += 1
+        size += storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+    return files, size
+
+
+def _collect_entries(keep, dry_run):
+    kvstore = default.kvstore
+    entries = 0
+    kept = set()
+    for key in list(kvstore._find_keys(identity='image')):
+        image_file = kvstore._get(key)
+        if image_file is not None and image_file.name in keep:
+            kept.add(key)
+            continue
+        entries += 1
+        if not dry_run:
+            kvstore._delete(key)
+    for key in list(kvstore._find_keys(identity='thumbnails')):
+        thumbnail_keys = kvstore._get(key, identity='thumbnails') or []
+        alive = [
+            thumbnail for thumbnail in thumbnail_keys if thumbnail in kept
+        ]
+        if key in kept and alive == thumbnail_keys:
+            continue
+        entries += 1
+        if dry_run:
+            continue
+        if key in kept and alive:
+            kvstore._set(key, alive, identity='thumbnails')
+        else:
+            kvstore._delete(key, identity='thumbnails')
+    return entries
+
+
+def collect_garbage(images, dry_run=False):
+    """Удаляет миниатюры и записи sorl, не нужные изображениям images.
+
+    Нужными считаются оригиналы из images и их миниатюры для текущих
+    THUMBNAIL_RENDITIONS; файлы прочих миниатюр (удаленных постов,
+    замененных картинок, прежних геометрий) и записи хранилища
+    ключей о них удаляются. Возвращает число удаленных файлов,
+    освобожденные байты и число удаленных записей.
+    """
+    images = set(images)
+    expected = {
+        thumbnail_file(_source(image), rendition).name
+        for image in images
+        for rendition in settings.THUMBNAIL_RENDITIONS
+    }
+    files, size = _collect_files(expected, dry_run)
+    entries = _collect_entries(expected | images, dry_run)
+    return {'files': files, 'bytes': size, 'entries': entries}
@@ -0,0 +1,313 @@
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core.paginators import CursorPaginator
+from .bulk import chunks
+from .models import Follow, Post, TimelineEntry, UserStats
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def is_pulled(author_id):
+    """Посты автора читаются при открытии ленты, а не рассылаются.
+
+    Автор становится таким, когда у него TIMELINE_PULL_THRESHOLD
+    подписчиков (рассылка его поста стоила бы столько вставок, сколько
+    у него подписчиков), и перестает, только когда их остается
+    TIMELINE_PULL_THRESHOLD - TIMELINE_PULL_MARGIN. Полоса между
+    порогами не дает автору на границе переключаться туда и обратно
+    при каждой подписке и отписке.
+    """
+    if settings.TIMELINE_PULL_THRESHOLD is None:
+        return False
+    return UserStats.objects.filter(user_id=author_id, pulled=True).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются при открытии."""
+    if settings.TIMELINE_PULL_THRESHOLD is None:
+        return []
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__pulled=True
+        ).values_list('author_id', flat=True)
+    )
+
+
+def promote(stats):
+    """Отмечает авторов из stats, набравших порог, как pulled."""
+    threshold = settings.TIMELINE_PULL_THRESHOLD
+    if threshold is not None:
+        stats.filter(
+            pulled=False, followers_count__gte=threshold
+        ).update(pulled=True)
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            author_id=post.author_id,
+            post_id=post.pk,
+            pub_date=post.pub_date
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту подписчика уже опубликованными постами автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            author_id=author_id,
+            post_id=post_id,
+            pub_date=pub_date
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def _push(author_id, posts, follows):
+    """Вставляет посты posts автора в ленты подписчиков по подпискам.
+
+    Подписчики берутся порциями по TIMELINE_BATCH_SIZE, и каждая
+    порция вставляется своей транзакцией, так что БД не держит
+    блокировку на всю рассылку.
+    """
+    followers = follows.order_by().values_list('user_id', flat=True)
+    for chunk in chunks(followers.iterator(), settings.TIMELINE_BATCH_SIZE):
+        _insert(
+            TimelineEntry(
+                user_id=user_id,
+                author_id=author_id,
+                post_id=post_id,
+                pub_date=pub_date
+            )
+            for user_id in chunk
+            for post_id, pub_date in posts
+        )
+
+
+def restore(author_id):
+    """Рассылает посты автора, опустившегося до нижней границы полосы.
+
+    Пока автор был pulled, его посты не попадали в ленты. Пока идет
+    рассылка, он остается pulled и лента читает его посты сама, поэтому
+    она не видна наполовину. Затем автор перестает быть pulled, если
+    за это время снова не набрал порог, и досылаются посты и подписки,
+    появившиеся во время рассылки. Уже разосланные записи пропускаются.
+    """
+    if not is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by('pk')
+    follows = Follow.objects.filter(author_id=author_id)
+    last_post = posts.values_list('pk', flat=True).last() or 0
+    last_follow = follows.order_by('pk').values_list(
+        'pk', flat=True
+    ).last() or 0
+    _push(
+        author_id, list(posts.values_list('pk', 'pub_date')),
+        follows.filter(pk__lte=last_follow)
+    )
+    demoted = UserStats.objects.filter(
+        user_id=author_id, pulled=True,
+        followers_count__lt=settings.TIMELINE_PULL_THRESHOLD
+    ).update(pulled=False)
+    if not demoted:
+        return
+    _push(
+        author_id,
+        list(posts.filter(pk__gt=last_post).values_list('pk', 'pub_date')),
+        follows.filter(pk__lte=last_follow)
+    )
+    for follow in follows.filter(pk__gt=last_follow).only('user_id'):
+        backfill(follow.user_id, author_id)
+
+
+def _restore_in_background(author_id):
+    try:
+        restore(author_id)
+    except Exception:
+        logger.exception('Не удалось разослать посты автора %s', author_id)
+    finally:
+        connections.close_all()
+
+
+def executor():
+    """Фоновый поток рассылки; очередью служит очередь пула."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='timeline'
+            )
+    return _executor
+
+
+def schedule_restore(author_id):
+    """Ставит restore в очередь после фиксации транзакции.
+
+    Запрос отписки не ждет рассылки, число его запросов не зависит
+    от числа подписчиков и постов автора. При TIMELINE_ASYNC = False
+    рассылка идет сразу в текущем потоке (удобно для тестов и команд).
+    """
+    if not settings.TIMELINE_ASYNC:
+        restore(author_id)
+        return
+    transaction.on_commit(
+        lambda: executor().submit(_restore_in_background, author_id)
+    )
+
+
+def on_follow(follow):
+    """Добавляет посты автора в ленту нового подписчика.
+
+    Если подписка довела число подписчиков автора до
+    TIMELINE_PULL_THRESHOLD, автор становится pulled.
+    """
+    promote(UserStats.objects.filter(user_id=follow.author_id))
+    backfill(follow.user_id, follow.author_id)
+
+
+def on_unfollow(follow):
+    """Убирает автора из ленты бывшего подписчика.
+
+    Если отписка опустила число подписчиков pulled-автора до нижней
+    границы полосы, его посты рассылаются в фоне (schedule_restore).
+    """
+    prune(follow.user_id, follow.author_id)
+    threshold = settings.TIMELINE_PULL_THRESHOLD
+    if threshold is not None and UserStats.objects.filter(
+        user_id=follow.author_id, pulled=True,
+        followers_count=threshold - settings.TIMELINE_PULL_MARGIN
+    ).exists():
+        schedule_restore(follow.author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(follows=None):
+    """Заново заполняет ленты по подпискам с учетом текущего порога.
+
+    Без follows пересобираются все ленты, и авторы заново делятся
+    на pulled и остальных по TIMELINE_PULL_THRESHOLD без полосы.
+    """
+    # Одна транзакция: ленты не видны полупустыми, и SQLite не
+    # фиксирует на диск каждую из тысяч вставок отдельно.
+    with transaction.atomic():
+        if follows is None:
+            follows = Follow.objects.all()
+            UserStats.objects.update(pulled=False)
+            promote(UserStats.objects.all())
+        TimelineEntry.objects.filter(
+            user_id__in=follows.values('user_id')
+        ).delete()
+        extend(follows)
+
+
+def extend(follows):
+    """Дополняет ленты постами авторов по подпискам, ничего не удаляя.
+
+    Уже добавленные записи пропускаются, поэтому повторный вызов
+    безопасен (так import_data дополняет ленты загруженными данными).
+    """
+    with transaction.atomic():
+        pairs = follows.values_list('user_id', 'author_id')
+        for user_id, author_id in pairs.iterator():
+            backfill(user_id, author_id)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Пагинатор ленты подписок поверх TimelineEntry.
+
+    Страница читается из индекса (user, pub_date, post) без соединения
+    с постами, затем посты страницы загружаются одним запросом по pk.
+    Посты авторов, которые не рассылаются (см. is_pulled), читаются
+    отдельно по индексу (author, pub_date) и сливаются с лентой
+    по ключу сортировки.
+    """
+    ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, user, per_page, **kwargs):
+        self.pulled = pulled_authors(user)
+        entries = TimelineEntry.objects.filter(user=user)
+        self.pulled_posts = None
+        if self.pulled:
+            entries = entries.exclude(author_id__in=self.pulled)
+            self.pulled_posts = CursorPaginator(
+                Post.objects.feed().filter(author_id__in=self.pulled),
+                per_page
+            )
+        super().__init__(entries.only('pub_date', 'post'), per_page, **kwargs)
+
+    @property
+    def count(self):
+        if self.counted and self._count is None and self.pulled_posts:
+            self._count = (
+                self.object_list.count() + self.pulled_posts.count
+            )
+        return super().count
+
+    def fetch(self, limit, offset=0, after=None, before=None):
+        if self.pulled_posts is None:
+            return self._posts(
+                super().fetch(limit, offset, after=after, before=before)
+            )
+        # Из каждого источника достаточно offset + limit первых записей.
+        window = offset + limit
+        pushed = self._posts(
+            super().fetch(window, after=after, before=before)
+        )
+        pulled = self.pulled_posts.fetch(window, after=after, before=before)
+        merged = list(heapq.merge(
+            pushed, pulled, key=lambda post: (post.pub_date, post.pk),
+            reverse=True
+        ))
+        if before is not None:
+            return merged[-limit:]
+        return merged[offset:offset + limit]
+
+    def _posts(self, entries):
+        posts = Post.objects.feed().in_bulk(
+            [entry.post_id for entry in entries]
+        )
+        return [
+            posts[entry.post_id] for entry in entries
+            if entry.post_id in posts
+        ]
+
+    def _value(self, obj, field):
+        if field.lstrip('-') == 'post_id':
+            return obj.pk
+        return super()._value(obj, field)
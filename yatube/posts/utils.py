@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core.paginators import CursorPaginator, table_rows
+
+from .models import Post
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от старых к новым.
+
+    Страницы читаются по индексу (post, pub_date, id) без COUNT(*):
+    число комментариев показывает счетчик поста.
+    """
+    ordering = ('pub_date', 'pk')
+
+    def __init__(self, post, **kwargs):
+        super().__init__(
+            post.comments.with_authors(), settings.COMMENTS_PER_PAGE,
+            count=False, **kwargs
+        )
+
+
+def get_page(request, paginator):
+    """Возвращает страницу по параметрам page, after и before запроса."""
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def paginate(request, queryset, count=True, estimate=None):
+    """Возвращает страницу ленты из queryset."""
+    paginator = CursorPaginator(
+        queryset, settings.POSTS_PER_PAGE, count=count, estimate=estimate
+    )
+    return get_page(request, paginator)
+
+
+def cached_count(key, queryset, estimate=None):
+    """Приблизительное число строк ленты для пагинатора.
+
+    Значение живет в кэше FEED_COUNT_TIMEOUT секунд, так что COUNT(*)
+    или запрос статистики estimate() выполняется не чаще раза за это
+    время. Если estimate() возвращает None, строки считаются точно.
+    """
+    key = f'feed-count:{key}'
+    count = cache.get(key)
+    if count is None:
+        count = estimate() if estimate else None
+        if count is None:
+            count = queryset.count()
+        cache.set(key, count, settings.FEED_COUNT_TIMEOUT)
+    return count
+
+
+def posts_estimate():
+    """Число всех постов по статистике СУБД."""
+    return table_rows(Post)
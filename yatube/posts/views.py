@@ -1,20 +1,36 @@
-from django.core.paginator import Paginator
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
-from . models import Post, Group, User, Follow, Comment
+from . models import Post, Group, User, Comment
 from . forms import PostForm, CommentForm
+from . utils import (
+    CommentPaginator, cached_count, get_page, paginate, posts_estimate
+)
+from . timeline import TimelinePaginator
+from . search import SearchResults
+from core import identity
+from core.paginators import InvalidCursor, WindowPaginator
+from . exporting import Export, stream_ndjson, stream_zip
+from . import follows
+from . cache import (
+    author_scope, cache_anonymous_page, group_scope, render_cards
+)
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-# from django.views.decorators.cache import cache_page
 
 
-# @cache_page(20, key_prefix='index_page')
+@cache_anonymous_page(lambda: ['global'])
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.feed()
+    page_obj = paginate(
+        request, posts, estimate=cached_count('global', posts, posts_estimate)
+    )
+    render_cards(page_obj, 'feed')
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -22,13 +38,15 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_anonymous_page(lambda slug: [group_scope(slug)])
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = identity.get_or_404(Group, slug=slug)
+    posts = group.posts.feed()
+    page_obj = paginate(
+        request, posts, estimate=cached_count(f'group:{group.pk}', posts)
+    )
+    render_cards(page_obj, 'group')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,16 +54,19 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_anonymous_page(lambda username: [author_scope(username)])
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        following = request.user.follower.filter(author=author).exists()
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = identity.get_or_404(User, username=username)
+    following = follows.is_following(request.user, author)
+    # Счетчики автора читаются отдельным запросом: они меняются с каждым
+    # постом и подпиской, поэтому в кэш core.identity не входят.
+    stats = getattr(author, 'stats', None)
+    page_obj = paginate(
+        request, author.posts.feed(),
+        estimate=stats.posts_count if stats else None
+    )
+    render_cards(page_obj, 'profile')
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -54,10 +75,30 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = WindowPaginator(
+        SearchResults(query), settings.POSTS_PER_PAGE
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
+    render_cards(page_obj, 'feed')
+    context = {
+        'title': 'Поиск',
+        'query': query,
+        'query_string': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.detail(), pk=post_id)
+    # Первая порция комментариев или следующая за ?after= без JavaScript.
+    comments = CommentPaginator(post).get_page(
+        1, after=request.GET.get('after')
+    )
     form = CommentForm()
     context = {
         'post': post,
@@ -67,6 +108,21 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Порция комментариев после курсора ?after= для «Показать еще»."""
+    post = get_object_or_404(Post.objects.only('author'), pk=post_id)
+    try:
+        comments = CommentPaginator(post).page_after(
+            request.GET.get('after', '')
+        )
+    except InvalidCursor:
+        return HttpResponse()
+    return render(request, 'posts/includes/comments.html', {
+        'post': post,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -75,11 +131,10 @@ def post_create(request):
         files=request.FILES or None
     )
     if form.is_valid():
-        temp_form = form.save(commit=False)
-        temp_form.author = request.user
-        temp_form.save()
+        form.instance.author = request.user
+        post = form.save()
         return redirect(
-            'posts:profile', temp_form.author
+            'posts:profile', post.author
         )
     return render(request, template, {'form': form})
 
@@ -121,10 +176,11 @@ def add_comment(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Публикации избранных авторов'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = TimelinePaginator(
+        request.user, settings.POSTS_PER_PAGE, count=False
+    )
+    page_obj = get_page(request, paginator)
+    render_cards(page_obj, 'feed')
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -134,23 +190,15 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    follow_author = get_object_or_404(User, username=username)
-    if follow_author != request.user and (
-        not request.user.follower.filter(author=follow_author).exists()
-    ):
-        Follow.objects.create(
-            user=request.user,
-            author=follow_author
-        )
+    follow_author = identity.get_or_404(User, username=username)
+    follows.follow(request.user, follow_author)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    follow_author = get_object_or_404(User, username=username)
-    data_follow = request.user.follower.filter(author=follow_author)
-    if data_follow.exists():
-        data_follow.delete()
+    follow_author = identity.get_or_404(User, username=username)
+    follows.unfollow(request.user, follow_author)
     return redirect('posts:profile', username)
 
 
@@ -168,3 +216,36 @@ def comment_delete(request, comment_id):
     if comment.author == request.user:
         comment.delete()
     return redirect('posts:post_detail', post_id=comment.post.pk)
+
+
+def export_response(request, posts, name):
+    """Потоковая выгрузка постов: ?format=zip — архив, иначе NDJSON."""
+    export = Export(posts)
+    if request.GET.get('format') == 'zip':
+        response = StreamingHttpResponse(
+            stream_zip(export), content_type='application/zip'
+        )
+        filename = f'{name}.zip'
+    else:
+        response = StreamingHttpResponse(
+            stream_ndjson(export), content_type='application/x-ndjson'
+        )
+        filename = f'{name}.ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(request, author.posts.all(), author.username)
+
+
+@login_required
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(request, group.posts.all(), group.slug)
@@ -0,0 +1,16 @@
+"""Настройки проекта по профилям: dev, test и prod.
+
+DJANGO_SETTINGS_MODULE=yatube.settings выбирает профиль по переменной
+окружения DJANGO_PROFILE (по умолчанию dev); профиль можно указать
+и напрямую: DJANGO_SETTINGS_MODULE=yatube.settings.prod.
+"""
+import importlib
+import os
+
+globals().update(
+    (name, value)
+    for name, value in vars(importlib.import_module(
+        f"{__name__}.{os.getenv('DJANGO_PROFILE', 'dev')}"
+    )).items()
+    if name.isupper()
+)
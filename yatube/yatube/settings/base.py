@@ -0,0 +1,242 @@
+"""Общие настройки профилей dev, test и prod.
+
+Значения, зависящие от окружения, берутся из переменных окружения;
+по умолчанию проект работает с файлом SQLite db.sqlite3.
+"""
+import os
+
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+SECRET_KEY = os.getenv(
+    'DJANGO_SECRET_KEY', '4dcn_an_4nogvk94-!nbw5mbp_2z6*)0osk@@d$gika(&_0i9a'
+)
+
+# Имя профиля: dev, test или prod; задается в модуле профиля.
+PROFILE = None
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv(
+    'DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1'
+).split(',')
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATES = [
+    {
+        'BACKEND': 'core.metrics.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+# Компилировать все шаблоны при старте процесса (см. core.warmup). Имеет
+# смысл только с кэширующим загрузчиком, как в профиле prod.
+TEMPLATE_WARMUP = False
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+# DB_ENGINE: sqlite (по умолчанию) или postgresql. DB_TEST_NAME задает
+# файл или имя тестовой БД, в том числе для команд-бенчмарков.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
+    }
+if os.getenv('DB_TEST_NAME'):
+    DATABASES['default']['TEST'] = {'NAME': os.getenv('DB_TEST_NAME')}
+
+# PRAGMA для каждого нового подключения к SQLite (см. core.db).
+SQLITE_PRAGMAS = {}
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+STATIC_URL = (os.path.join(BASE_DIR, '/static/'))
+
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+
+# Кэш пользователей и групп в памяти процесса (см. core.identity;
+# пользователя сессии загружает CachedAuthenticationMiddleware):
+# записей не больше IDENTITY_CACHE_SIZE, каждая живет
+# IDENTITY_CACHE_TIMEOUT секунд и сверяется с версией строки в CACHES;
+# 0 выключает кэш.
+IDENTITY_CACHE_SIZE = 10000
+IDENTITY_CACHE_TIMEOUT = 60
+
+LOGIN_URL = 'users:login'
+
+LOGIN_REDIRECT_URL = 'posts:index'
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+POSTS_PER_PAGE = 10
+
+COMMENTS_PER_PAGE = 20
+
+TIMELINE_BATCH_SIZE = 500
+
+# Посты авторов с TIMELINE_PULL_THRESHOLD подписчиков читаются при
+# открытии ленты, а не рассылаются; обратно на рассылку автор переходит,
+# когда подписчиков остается на TIMELINE_PULL_MARGIN меньше порога.
+# Рассылка в ленты после этого идет в фоновом потоке.
+TIMELINE_PULL_THRESHOLD = 10000
+TIMELINE_PULL_MARGIN = 1000
+TIMELINE_ASYNC = True
+
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд хранить в кэше подписки пользователя (см. posts.follows).
+# Кэш процесса не видит подписок из других процессов, поэтому недолго.
+FOLLOW_SET_TIMEOUT = 60
+
+# Сколько секунд пагинатор лент использует сохраненное число постов.
+FEED_COUNT_TIMEOUT = 60 * 5
+
+# Кэш процесса: изменения, сделанные другим процессом или командой
+# manage.py, до него не доходят, поэтому страницы хранятся недолго.
+# Профиль prod использует общий кэш (см. prod.py).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PAGE_CACHE_TIMEOUT = 60
+
+# Миниатюры изображений постов: имя -> (геометрия, опции sorl).
+THUMBNAIL_RENDITIONS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_WORKERS = 2
+# Создавать миниатюры в фоновом потоке (в профиле test — сразу).
+THUMBNAIL_ASYNC = True
+
+# Обработка загруженных изображений (posts.images): изображения больше
+# IMAGE_MAX_PIXELS отклоняются до декодирования, остальные уменьшаются
+# до IMAGE_MAX_SIZE пикселей по большей стороне.
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIZE = 2048
+IMAGE_QUALITY = 85
+
+SEARCH_ADMIN_LIMIT = 1000
+
+# Сколько строк читать из БД за раз при выгрузке постов.
+EXPORT_CHUNK_SIZE = 2000
+
+# Анализатор поиска: токенизатор и фильтры токенов по порядку. После
+# изменения цепочки индекс нужно пересобрать командой rebuild_search.
+SEARCH_ANALYZER = {
+    'tokenizer': 'posts.analysis.tokenize',
+    'filters': [
+        'posts.analysis.lowercase',
+        'posts.analysis.fold_yo',
+        'posts.analysis.remove_stop_words',
+        'posts.analysis.russian_stem',
+    ],
+}
+
+# Метрики на /metrics/ доступны сотрудникам и по заголовку
+# Authorization: Bearer <METRICS_TOKEN>.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Лимиты SQL-запросов на запрос к представлению. При
+# QUERY_BUDGETS_ENFORCED (профиль test) превышение лимита — ошибка
+# QueryBudgetExceeded. Лимиты создания и правки поста
+# включают синхронное создание миниатюр при THUMBNAIL_ASYNC = False.
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 7,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:post_comments': 4,
+    'posts:follow_index': 7,
+    'posts:search': 7,
+    'posts:post_create': 32,
+    'posts:post_edit': 32,
+    'posts:add_comment': 10,
+    'posts:profile_follow': 15,
+    'posts:profile_unfollow': 15,
+}
+QUERY_BUDGETS_ENFORCED = False
@@ -0,0 +1,15 @@
+"""Разработка: DEBUG и панель django-debug-toolbar."""
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, MIDDLEWARE
+
+PROFILE = 'dev'
+
+DEBUG = True
+
+INSTALLED_APPS = [*INSTALLED_APPS, 'debug_toolbar']
+
+MIDDLEWARE = [*MIDDLEWARE, 'debug_toolbar.middleware.DebugToolbarMiddleware']
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
@@ -0,0 +1,82 @@
+"""Рабочий сервер: DJANGO_PROFILE=prod или yatube.settings.prod.
+
+Без панели отладки, с постоянными подключениями к БД, режимом WAL
+для SQLite и скомпилированными при старте шаблонами.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, DB_ENGINE, TEMPLATES
+
+PROFILE = 'prod'
+
+DEBUG = False
+
+SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Задайте DJANGO_SECRET_KEY.')
+
+# Подключение к БД живет между запросами до CONN_MAX_AGE секунд.
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+    }
+}
+
+if DB_ENGINE == 'sqlite':
+    # Ждать освобождения блокировки записи вместо ошибки database is locked.
+    DATABASES['default']['OPTIONS'] = {'timeout': 20}
+    # WAL: чтение не блокируется записью. synchronous=NORMAL в режиме WAL
+    # не повреждает БД при сбое, теряя лишь последние транзакции.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+    }
+
+# Шаблоны компилируются один раз на процесс и берутся из памяти. При
+# DEBUG = False Django включает кэширующий загрузчик и сам; здесь он задан
+# явно, поэтому APP_DIRS выключен.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+TEMPLATE_WARMUP = True
+
+# Общий для всех процессов кэш: версии страниц и подписки, измененные
+# одним процессом или командой manage.py, видны остальным. Memcached
+# (MEMCACHED_LOCATION=host:port, пакет python-memcached) или таблица
+# yatube_cache в БД, которую создает manage.py createcachetable.
+if os.getenv('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'yatube_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+FOLLOW_SET_TIMEOUT = 60 * 60
@@ -0,0 +1,17 @@
+"""Тесты: python manage.py test выбирает этот профиль сам."""
+from .base import *  # noqa: F401,F403
+
+PROFILE = 'test'
+
+# Миниатюры и рассылка в ленты выполняются сразу: фоновый поток писал
+# бы в тестовую БД, пока она очищается после теста.
+THUMBNAIL_ASYNC = False
+TIMELINE_ASYNC = False
+
+QUERY_BUDGETS_ENFORCED = True
+
+# Очищает кэши процесса (core.identity) перед каждым тестом.
+TEST_RUNNER = 'core.testing.Runner'
+
+# Хеширование паролей MD5 заметно ускоряет тесты с create_user.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
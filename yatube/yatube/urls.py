@@ -3,6 +3,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_export
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
@@ -13,11 +15,13 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', metrics_export, name='metrics'),
 ]
 
 if settings.DEBUG:
-    import debug_toolbar
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)